@@ -5,6 +5,7 @@ from pyatmosphere.channels import Channel, QuickChannel
 from pyatmosphere.grids import *
 from pyatmosphere.pathes import *
 from pyatmosphere.phase_screens import *
+from pyatmosphere.phase_screen_banks import *
 from pyatmosphere.pupils import *
 from pyatmosphere.sources import *
 
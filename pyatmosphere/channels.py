@@ -3,7 +3,7 @@ import numpy as np
 
 from pyatmosphere.theory.atmosphere import get_rytov2
 from pyatmosphere.measures import I
-from pyatmosphere.utils import CrossRef
+from pyatmosphere.utils import CrossRef, to_native_order, to_centered_order
 from pyatmosphere.gpu import get_array
 
 from pyatmosphere.grids import RectGrid, RandLogPolarGrid
@@ -20,13 +20,25 @@ class Channel:
     path = CrossRef("channel")
     pupil = CrossRef("channel")
 
-    def __init__(self, grid, source, path, pupil=None, name=""):
+    def __init__(self, grid, source, path, pupil=None, name="", seed=None):
         self.grid = grid
         self.source = source
         self.path = path
         self.pupil = pupil
         self.output = None
         self.name = name
+        self.seed(seed)
+
+    def seed(self, seed=None):
+        """Spawn an independent random stream for every phase screen of the path
+
+        seed is an int, a numpy SeedSequence or None for fresh entropy.
+        """
+        self.seed_sequence = seed if isinstance(
+            seed, np.random.SeedSequence) else np.random.SeedSequence(seed)
+        phase_screens = getattr(self.path, "phase_screens", [])
+        for phase_screen, seed_sequence in zip(phase_screens, self.seed_sequence.spawn(len(phase_screens))):
+            phase_screen.seed(seed_sequence)
 
     def run(self, pupil=True, *args, **kwargs):
         if pupil:
@@ -34,14 +46,24 @@ class Channel:
         else:
             return self.path.output(self.source.output(), *args, **kwargs)
 
-    def generator(self, pupil=True, store_output=True, *args, **kwargs):
+    def generator(self, pupil=True, store_output=True, *args, native=False, **kwargs):
+        """Yield the field and the phase screen after every screen, in native FFT order if `native`
+
+        The stored output is centered in both cases.
+        """
         self.output = None
+        if native:
+            generator = self.path.native_generator(to_native_order(self.source.output()), *args, **kwargs)
+        else:
+            generator = self.path.generator(self.source.output(), *args, **kwargs)
         if store_output:
-            path_output = yield from self.path.generator(self.source.output(), *args, **kwargs)
+            path_output = yield from generator
+            if native:
+                path_output = to_centered_order(path_output)
             self.output = self.pupil.output(
                 path_output) if pupil else path_output
         else:
-            yield from self.path.generator(self.source.output(), *args, **kwargs)
+            yield from generator
 
     def get_rythov2(self):
         return get_rytov2(self.path.phase_screen.model.Cn2, self.source.k, self.path.length)
@@ -58,7 +80,8 @@ def QuickChannel(
         beam_wvl=808e-9,
         aperture_radius=0.02,
         grid_resolution=1024,
-        grid_delta=0.001
+        grid_delta=0.001,
+        seed=None
         ):
     quick_channel = Channel(
         grid=RectGrid(resolution=grid_resolution, delta=grid_delta),
@@ -75,6 +98,7 @@ def QuickChannel(
             length=length,
             count=count_ps
             ),
-        pupil=CirclePupil(radius=aperture_radius)
+        pupil=CirclePupil(radius=aperture_radius),
+        seed=seed
         )
     return quick_channel
@@ -1,8 +1,18 @@
+import atexit
+import os
+import pickle
 import numpy
 
 
 config = {
     "use_gpu": False,
+    # CPU FFT backend: "numpy", "scipy" or "pyfftw"
+    "fft_backend": "numpy",
+    # Threads of the "scipy" and "pyfftw" backends, -1 uses all cores
+    "fft_workers": -1,
+    "fftw_planner_effort": "FFTW_MEASURE",
+    # File to load and store pyFFTW wisdom
+    "fftw_wisdom_path": None,
 }
 
 
@@ -14,7 +24,156 @@ def get_xp():
         return numpy
 
 
+def get_rng(seed=None):
+    """Return a random Generator of the array module, seed is an int or a numpy SeedSequence"""
+    if config['use_gpu']:
+        import cupy
+        if isinstance(seed, numpy.random.SeedSequence):
+            seed = int(seed.generate_state(1, numpy.uint64)[0])
+        return cupy.random.default_rng(seed)
+    return numpy.random.default_rng(seed)
+
+
 def get_array(xp_array):
     if config['use_gpu']:
         return xp_array.get()
     return xp_array
+
+
+class ModuleFFTBackend:
+    """FFT of numpy.fft-like modules, numpy and cupy cache plans internally"""
+
+    def __init__(self, module):
+        self.module = module
+
+    def fft2(self, x, axes=(-2, -1)):
+        return self.module.fft2(x, axes=axes)
+
+    def ifft2(self, x, axes=(-2, -1)):
+        return self.module.ifft2(x, axes=axes)
+
+    def rfft2(self, x, axes=(-2, -1)):
+        return self.module.rfft2(x, axes=axes)
+
+    def irfft2(self, x, s, axes=(-2, -1)):
+        return self.module.irfft2(x, s=s, axes=axes)
+
+    def rfft(self, x, n=None, axis=-1):
+        return self.module.rfft(x, n=n, axis=axis)
+
+    def irfft(self, x, n=None, axis=-1):
+        return self.module.irfft(x, n=n, axis=axis)
+
+
+class ScipyFFTBackend:
+    """Multithreaded scipy.fft, pocketfft caches plans per shape and dtype"""
+
+    def __init__(self, workers):
+        import scipy.fft
+        self.module = scipy.fft
+        self.workers = workers
+
+    def fft2(self, x, axes=(-2, -1)):
+        return self.module.fft2(x, axes=axes, workers=self.workers)
+
+    def ifft2(self, x, axes=(-2, -1)):
+        return self.module.ifft2(x, axes=axes, workers=self.workers)
+
+    def rfft2(self, x, axes=(-2, -1)):
+        return self.module.rfft2(x, axes=axes, workers=self.workers)
+
+    def irfft2(self, x, s, axes=(-2, -1)):
+        return self.module.irfft2(x, s=s, axes=axes, workers=self.workers)
+
+    def rfft(self, x, n=None, axis=-1):
+        return self.module.rfft(x, n=n, axis=axis, workers=self.workers)
+
+    def irfft(self, x, n=None, axis=-1):
+        return self.module.irfft(x, n=n, axis=axis, workers=self.workers)
+
+
+class FFTWBackend:
+    """pyFFTW with plans cached per transform, shape and dtype and persisted wisdom
+
+    New wisdom is written once at exit, not after every plan.
+    """
+
+    def __init__(self, workers, planner_effort, wisdom_path=None):
+        import pyfftw
+        import pyfftw.builders
+        self.pyfftw = pyfftw
+        self.threads = workers if workers > 0 else os.cpu_count()
+        self.planner_effort = planner_effort
+        self.wisdom_path = wisdom_path
+        self.plans = {}
+        self._save_registered = False
+        if wisdom_path and os.path.exists(wisdom_path):
+            with open(wisdom_path, "rb") as f:
+                pyfftw.import_wisdom(pickle.load(f))
+
+    def save_wisdom(self):
+        """Replace the wisdom file atomically, processes sharing the path never see a partial file"""
+        if not self.wisdom_path:
+            return
+        tmp_path = f"{self.wisdom_path}.{os.getpid()}.tmp"
+        with open(tmp_path, "wb") as f:
+            pickle.dump(self.pyfftw.export_wisdom(), f)
+        os.replace(tmp_path, self.wisdom_path)
+
+    def execute(self, transform, x, **kwargs):
+        """kwargs are the pyfftw.builders arguments of the transform, such as axes and s"""
+        key = (transform, x.shape, x.dtype, tuple(sorted(kwargs.items())))
+        if key not in self.plans:
+            builder = getattr(self.pyfftw.builders, transform)
+            self.plans[key] = builder(
+                self.pyfftw.empty_aligned(x.shape, dtype=x.dtype),
+                threads=self.threads, planner_effort=self.planner_effort, **kwargs)
+            if self.wisdom_path and not self._save_registered:
+                atexit.register(self.save_wisdom)
+                self._save_registered = True
+        plan = self.plans[key]
+        # A new output array for every call, the plan's own array is reused by the next call
+        return plan(x, output_array=self.pyfftw.empty_aligned(plan.output_shape, dtype=plan.output_dtype))
+
+    def fft2(self, x, axes=(-2, -1)):
+        return self.execute("fft2", x, axes=axes)
+
+    def ifft2(self, x, axes=(-2, -1)):
+        return self.execute("ifft2", x, axes=axes)
+
+    def rfft2(self, x, axes=(-2, -1)):
+        return self.execute("rfft2", x, axes=axes)
+
+    def irfft2(self, x, s, axes=(-2, -1)):
+        return self.execute("irfft2", x, axes=axes, s=tuple(s))
+
+    def rfft(self, x, n=None, axis=-1):
+        return self.execute("rfft", x, n=n, axis=axis)
+
+    def irfft(self, x, n=None, axis=-1):
+        return self.execute("irfft", x, n=n, axis=axis)
+
+
+_fft_backends = {}
+
+
+def get_fft():
+    """Return the FFT backend chosen by the config, backends are kept with their plans"""
+    if config['use_gpu']:
+        key = ("cupy",)
+    else:
+        key = (config["fft_backend"], config["fft_workers"],
+               config["fftw_planner_effort"], config["fftw_wisdom_path"])
+    if key not in _fft_backends:
+        if config['use_gpu'] or config["fft_backend"] == "numpy":
+            backend = ModuleFFTBackend(get_xp().fft)
+        elif config["fft_backend"] == "scipy":
+            backend = ScipyFFTBackend(config["fft_workers"])
+        elif config["fft_backend"] == "pyfftw":
+            backend = FFTWBackend(config["fft_workers"], config["fftw_planner_effort"],
+                                  config["fftw_wisdom_path"])
+        else:
+            raise ValueError(
+                "Available values for fft_backend: 'numpy', 'scipy' and 'pyfftw'")
+        _fft_backends[key] = backend
+    return _fft_backends[key]
@@ -1,7 +1,8 @@
 from dataclasses import dataclass
+import functools
 import numpy as np
 
-from pyatmosphere.gpu import get_xp
+from pyatmosphere.gpu import get_xp, get_rng
 
 
 class Grid:
@@ -9,6 +10,29 @@ class Grid:
         return get_xp()
 
 
+def _read_only(value):
+    if isinstance(value, (tuple, list)):
+        return tuple(_read_only(item) for item in value)
+    if isinstance(value, np.ndarray):
+        value.flags.writeable = False
+    return value
+
+
+def cached(method):
+    """Memoize the result per array backend until `resolution` or `delta` changes
+
+    Arrays are shared between callers and are made read-only on numpy (cupy has no such flag).
+    """
+    @functools.wraps(method)
+    def wrapper(self):
+        key = (method.__name__, self.get_array_module().__name__)
+        cache = self.__dict__.setdefault("_cache", {})
+        if key not in cache:
+            cache[key] = _read_only(method(self))
+        return cache[key]
+    return wrapper
+
+
 @dataclass
 class RectGrid(Grid):
     resolution: tuple
@@ -20,6 +44,16 @@ class RectGrid(Grid):
         else:
             self.resolution = self.resolution
 
+    def __setattr__(self, name, value):
+        if name in ("resolution", "delta"):
+            self.__dict__.pop("_cache", None)
+        super().__setattr__(name, value)
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        state.pop("_cache", None)
+        return state
+
     @property
     def size(self):
         return np.array(self.resolution) * self.delta
@@ -52,18 +86,22 @@ class RectGrid(Grid):
     def _bottom_bound(self):
         return self.resolution[1] // 2 + bool(self.resolution[1] % 2)
 
+    @cached
     def get_NxNy(self):
         xp = self.get_array_module()
         return xp.ogrid[self._top_bound:self._bottom_bound, self._left_bound:self._right_bound]
 
+    @cached
     def get_N2(self):
         Nx, Ny = self.get_NxNy()
         return Nx**2 + Ny**2
 
+    @cached
     def get_x(self):
         xp = self.get_array_module()
         return xp.arange(self._left_bound, self._right_bound, dtype=np.float32).reshape((1, -1)) * self.delta
 
+    @cached
     def get_y(self):
         xp = self.get_array_module()
         return xp.arange(self._top_bound, self._bottom_bound, dtype=np.float32).reshape((-1, 1)) * self.delta
@@ -71,14 +109,17 @@ class RectGrid(Grid):
     def get_xy(self):
         return self.get_x(), self.get_y()
 
+    @cached
     def get_rho2(self):
         x, y = self.get_xy()
         return x**2 + y**2
 
+    @cached
     def get_rho(self):
         xp = self.get_array_module()
         return xp.sqrt(self.get_rho2())
 
+    @cached
     def get_f_grid(self):
         f_grid = RectGrid(resolution=int(np.min(self.resolution)),
                           delta=1 / (np.min(self.resolution) * self.delta))
@@ -95,16 +136,20 @@ class RandLogPolarGrid(Grid):
     def base(self):
         return np.exp(np.linspace(np.log(self.f_min), np.log(self.f_max), self.points, dtype=np.float32))
 
-    def get_rho(self):
+    def get_rho(self, batch_size: int = None, rng=None):
         xp = self.get_array_module()
-        rand = np.random.random(size=(1,)).astype(np.float32)
-        f = self.base
-        f_prev = np.insert(f, 0, 0)[:-1]
-        return xp.array(np.sqrt(f_prev**2 + rand * (f**2 - f_prev**2)))
-
-    def get_theta(self):
+        rng = rng or get_rng()
+        batch_shape = (batch_size, 1) if batch_size else (1,)
+        rand = rng.random(size=batch_shape, dtype=np.float32)
+        f = xp.asarray(self.base)
+        f_prev = xp.asarray(np.insert(self.base, 0, 0)[:-1])
+        return xp.sqrt(f_prev**2 + rand * (f**2 - f_prev**2))
+
+    def get_theta(self, batch_size: int = None, rng=None):
         xp = self.get_array_module()
-        return 2 * xp.pi * xp.random.random(size=(self.points,)).astype(np.float32)
+        rng = rng or get_rng()
+        batch_shape = (batch_size,) if batch_size else ()
+        return 2 * xp.pi * rng.random(size=(*batch_shape, self.points), dtype=np.float32)
 
     def get_x(self, rho, theta):
         xp = self.get_array_module()
@@ -115,8 +160,9 @@ class RandLogPolarGrid(Grid):
         return rho * xp.sin(theta)
 
     def get_xy(self, rho, theta):
+        """Return fx of shape (..., 1, points) and fy of shape (..., points, 1)"""
         xp = self.get_array_module()
-        return (rho * xp.cos(theta)).reshape((1, -1)), (rho * xp.sin(theta)).reshape((-1, 1))
+        return (rho * xp.cos(theta))[..., None, :], (rho * xp.sin(theta))[..., :, None]
 
     # def plot(self):
     #   lim = self.f_min * 10
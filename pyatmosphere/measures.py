@@ -1,3 +1,11 @@
+from pyatmosphere.gpu import get_array, get_xp, get_fft
+
+
+def _reduce(value):
+    """Return a number for a single field or an array of values for a batch of fields"""
+    return value.item() if value.ndim == 0 else get_array(value)
+
+
 def I(channel, output=None, *args, **kwargs):
     if not output is None:
         return abs(output)**2
@@ -5,17 +13,39 @@ def I(channel, output=None, *args, **kwargs):
 
 
 def eta(channel, *args, **kwargs):
-    return (I(channel, *args, **kwargs).sum(axis=(-1, -2)) * channel.grid.delta**2).item()
+    return _reduce(I(channel, *args, **kwargs).sum(axis=(-1, -2)) * channel.grid.delta**2)
+
+
+def eta_map(channel, output=None, pupil=None, *args, **kwargs):
+    """Return eta of the pupil centered at every grid point, shape (..., Ny, Nx)
+
+    eta_map[..., i, j] is eta of the pupil shifted to (x[j], y[i]), i.e. CirclePupil shift (x[j], -y[i]),
+    and `eta` of the centered pupil is at the grid origin_index. All offsets come from one
+    cross-correlation of the intensity with the pupil mask, zero-padded so that offsets do not wrap.
+    The pupil is channel.pupil by default and must be attached to the channel.
+    """
+    kwargs["pupil"] = False
+    xp = get_xp()
+    pupil = pupil or channel.pupil
+    intensity = I(channel, output, *args, **kwargs)
+    ny, nx = intensity.shape[-2:]
+    padding = [(0, 0)] * (intensity.ndim - 2) + [(0, ny), (0, nx)]
+    spectrum = get_fft().rfft2(xp.pad(intensity, padding)) * pupil.get_spectrum()
+    # correlation[k] = sum_j I[j + k] * mask[j], the pupil centered at grid index origin + k
+    correlation = get_fft().irfft2(spectrum, s=(2 * ny, 2 * nx))
+    origin_x, origin_y = channel.grid.origin_index
+    eta_map = xp.roll(correlation, (origin_y, origin_x), axis=(-2, -1))[..., :ny, :nx]
+    return get_array(eta_map * channel.grid.delta**2)
 
 
 def mean_x(channel, *args, **kwargs):
     kwargs["pupil"] = False
-    return ((I(channel, *args, **kwargs) * channel.grid.get_x()).sum(axis=(-1, -2)) * channel.grid.delta**2).item()
+    return _reduce((I(channel, *args, **kwargs) * channel.grid.get_x()).sum(axis=(-1, -2)) * channel.grid.delta**2)
 
 
 def mean_y(channel, *args, **kwargs):
     kwargs["pupil"] = False
-    return ((I(channel, *args, **kwargs) * (-1) * channel.grid.get_y()).sum(axis=(-1, -2)) * channel.grid.delta**2).item()
+    return _reduce((I(channel, *args, **kwargs) * (-1) * channel.grid.get_y()).sum(axis=(-1, -2)) * channel.grid.delta**2)
 
 # def mean_r(channel, *args, **kwargs):
 #   kwargs["pupil"] = False
@@ -25,18 +55,47 @@ def mean_y(channel, *args, **kwargs):
 
 def mean_x2(channel, *args, **kwargs):
     kwargs["pupil"] = False
-    return ((I(channel, *args, **kwargs) * channel.grid.get_x()**2).sum(axis=(-1, -2)) * channel.grid.delta**2).item()
+    return _reduce((I(channel, *args, **kwargs) * channel.grid.get_x()**2).sum(axis=(-1, -2)) * channel.grid.delta**2)
 
 
 def mean_xy(channel, *args, **kwargs):
     kwargs["pupil"] = False
-    return ((I(channel, *args, **kwargs) * (-1 * channel.grid.get_x() * channel.grid.get_y())).sum(axis=(-1, -2)) * channel.grid.delta**2).item()
+    return _reduce((I(channel, *args, **kwargs) * (-1 * channel.grid.get_x() * channel.grid.get_y())).sum(axis=(-1, -2)) * channel.grid.delta**2)
 
 
 def mean_y2(channel, *args, **kwargs):
     kwargs["pupil"] = False
-    return ((I(channel, *args, **kwargs) * channel.grid.get_y()**2).sum(axis=(-1, -2)) * channel.grid.delta**2).item()
+    return _reduce((I(channel, *args, **kwargs) * channel.grid.get_y()**2).sum(axis=(-1, -2)) * channel.grid.delta**2)
 
 # def mean_r2(channel, *args, **kwargs):
 #   kwargs["pupil"] = False
 #   return ((I(channel, *args, **kwargs) * channel.grid.get_rho2()).sum(axis=(-1, -2)) * channel.grid.delta**2).item()
+
+
+def beam_moments(channel, *args, **kwargs):
+    """Return all first and second beam moments of the intensity in a single reduction
+
+    The keys are mean_x, mean_y, mean_x2, mean_xy, mean_y2 and mean_x2_r,
+    the last one is the second moment along the direction of the beam centroid.
+    """
+    kwargs["pupil"] = False
+    xp = get_xp()
+    x = channel.grid.get_x()[0]
+    y = channel.grid.get_y()[:, 0]
+    x_powers = xp.stack([xp.ones_like(x), x, x**2], axis=-1)
+    y_powers = xp.stack([xp.ones_like(y), y, y**2], axis=0)
+    # moments[..., a, b] = sum(I * y**a * x**b)
+    moments = y_powers @ I(channel, *args, **kwargs) @ x_powers * channel.grid.delta**2
+    result = {
+        "mean_x": moments[..., 0, 1],
+        "mean_y": -moments[..., 1, 0],
+        "mean_x2": moments[..., 0, 2],
+        "mean_xy": -moments[..., 1, 1],
+        "mean_y2": moments[..., 2, 0],
+    }
+    r0 = xp.sqrt(result["mean_x"]**2 + result["mean_y"]**2)
+    cosXi = result["mean_x"] / r0
+    sinXi = result["mean_y"] / r0
+    result["mean_x2_r"] = result["mean_x2"] * cosXi**2 + \
+        2 * result["mean_xy"] * cosXi * sinXi + result["mean_y2"] * sinXi**2
+    return {key: _reduce(value) for key, value in result.items()}
@@ -0,0 +1,59 @@
+"""Type-1 non-uniform FFT by Gaussian gridding
+
+Greengard L., Lee J.-Y., Accelerating the nonuniform fast Fourier transform, SIAM Review 46 (2004)
+"""
+import numpy as np
+
+from pyatmosphere.gpu import get_xp, get_fft
+
+
+OVERSAMPLING = 2
+
+
+def _spread_weights(xp, t, h, tau, spread):
+    """Fine grid indices (..., P, 2 * spread) around positions t and their Gaussian weights"""
+    offsets = xp.arange(-spread + 1, spread + 1)
+    index = xp.floor(t / h).astype(np.int64)[..., None] + offsets
+    weights = xp.exp(-(index * h - t[..., None])**2 / (4 * tau))
+    return index, weights
+
+
+def nufft2d1(c, tx, ty, nx, ny, spread: int = 6):
+    """Return sum_p c_p exp(i (nx tx_p + ny ty_p)) of shape (..., len(ny), len(nx))
+
+    Parameters:
+    c (array): Coefficients of shape (..., P)
+    tx, ty (array): Off-grid positions in radians, broadcastable to c, wrapped modulo 2 pi
+    nx, ny (array): Integer modes of the uniform output grid, |n| < max(len(nx), len(ny))
+    spread (int): Half-width of the Gaussian in fine grid points, 6 gives single precision
+        and 12 double precision
+
+    The cost is O(P spread**2 + M**2 log M) for M = 2 max(len(nx), len(ny)).
+    """
+    xp = get_xp()
+    modes = max(len(nx), len(ny))
+    fine = OVERSAMPLING * modes
+    h = 2 * np.pi / fine
+    tau = np.pi * spread / (modes**2 * OVERSAMPLING * (OVERSAMPLING - 0.5))
+
+    c, tx, ty = xp.broadcast_arrays(c, tx % (2 * np.pi), ty % (2 * np.pi))
+    batch_shape = c.shape[:-1]
+    index_x, weights_x = _spread_weights(xp, tx, h, tau, spread)
+    index_y, weights_y = _spread_weights(xp, ty, h, tau, spread)
+
+    # Every point adds c * gx * gy to a (2 spread)x(2 spread) block of the periodic fine grid
+    batch_index = xp.arange(int(np.prod(batch_shape))).reshape(
+        (*batch_shape, 1, 1, 1)) * fine**2
+    index = (batch_index + (index_y % fine)[..., :, None] * fine + (index_x % fine)[..., None, :]).ravel()
+    values = (c[..., None, None] * weights_y[..., :, None] * weights_x[..., None, :]).ravel()
+    size = int(np.prod(batch_shape)) * fine**2
+    grid = (xp.bincount(index, weights=values.real, minlength=size) +
+            1j * xp.bincount(index, weights=values.imag, minlength=size))
+    grid = grid.astype(np.complex64).reshape((*batch_shape, fine, fine))
+
+    # ifft2 averages sum_m f(x_m) exp(i n x_m) over the fine grid, the Gaussian is then deconvolved
+    spectrum = get_fft().ifft2(grid)
+    nx, ny = xp.asarray(nx), xp.asarray(ny)
+    spectrum = spectrum[..., (ny % fine)[:, None], (nx % fine)[None, :]]
+    deconvolution = (np.pi / tau) * xp.exp(tau * (ny[:, None]**2 + nx[None, :]**2))
+    return spectrum * deconvolution.astype(np.float32)
@@ -4,7 +4,8 @@ import numpy as np
 import copy
 
 from pyatmosphere.gpu import get_xp
-from pyatmosphere.theory.vacuum import vacuum_propagation
+from pyatmosphere.theory.vacuum import vacuum_propagation, native_vacuum_propagation, get_cached_transfer_function
+from pyatmosphere.utils import to_native_order, to_centered_order
 
 
 class AbstractPath(ABC):
@@ -28,17 +29,30 @@ class VacuumPath(AbstractPath):
     def lossless_output(self, input, length=None):
         length = length if not length is None else self.length
         if length > 0:
+            grid = self.channel.grid
             return vacuum_propagation(
                 input=input,
                 length=length,
                 k=self.channel.source.k,
-                delta=self.channel.grid.delta,
-                f2=self.channel.grid.get_f_grid().get_rho2(),
-                f_delta=self.channel.grid.get_f_grid().delta
+                delta=grid.delta,
+                f_delta=grid.get_f_grid().delta,
+                transfer_function=get_cached_transfer_function(
+                    length, self.channel.source.k, grid.resolution, grid.delta)
             ).astype(np.complex64)
         else:
             return input
 
+    def native_lossless_output(self, input, length=None):
+        """Propagate a field stored in native FFT order"""
+        length = length if not length is None else self.length
+        if length > 0:
+            grid = self.channel.grid
+            transfer_function = get_cached_transfer_function(
+                length, self.channel.source.k, grid.resolution, grid.delta, native=True)
+            return native_vacuum_propagation(input, transfer_function).astype(np.complex64, copy=False)
+        else:
+            return input
+
 
 class PhaseScreensPath(AbstractPath):
     def __init__(self, length, phase_screens, positions, losses_db=0):
@@ -51,28 +65,41 @@ class PhaseScreensPath(AbstractPath):
             phase_screen.channel = self.channel
 
     def lossless_output(self, input, *args, **kwargs):
-        generator = self.generator(input, *args, **kwargs)
+        generator = self.native_generator(to_native_order(input), *args, **kwargs)
         try:
             while True:
                 next(generator)
         except StopIteration as e:
-            return e.value
+            return to_centered_order(e.value)
 
     def generator(self, input, *args, **kwargs):
+        generator = self.native_generator(to_native_order(input), *args, **kwargs)
+        try:
+            while True:
+                output, phase_screen = next(generator)
+                yield to_centered_order(output), to_centered_order(phase_screen)
+        except StopIteration as e:
+            return to_centered_order(e.value)
+
+    def native_generator(self, input, *args, **kwargs):
+        """Propagate a field in native FFT order
+
+        Yields fields and phase screens in native FFT order, so that steps nobody reads are never shifted.
+        """
         xp = get_xp()
         vacuum_path = VacuumPath(length=None)
         vacuum_path.channel = self.channel
         self.init_phase_screens()
 
         for i, phase_screen in enumerate(self.phase_screens):
-            vacuum_path.length = self.positions[i] - \
+            length = self.positions[i] - \
                 self.positions[i - 1] if i > 0 else self.positions[0]
-            generated_phase_screen = phase_screen.generate(*args, **kwargs)
-            part_losses_db = self.losses_db * vacuum_path.length / self.length
+            generated_phase_screen = phase_screen.generate_native(*args, **kwargs)
+            part_losses_db = self.losses_db * length / self.length
             input = self.append_losses(
-                xp.exp(-1j * generated_phase_screen) * vacuum_path.output(input), losses_db=part_losses_db)
+                xp.exp(-1j * generated_phase_screen) * vacuum_path.native_lossless_output(input, length), losses_db=part_losses_db)
             yield input, generated_phase_screen
-        return vacuum_path.output(input, length=self.length - self.positions[-1])
+        return vacuum_path.native_lossless_output(input, length=self.length - self.positions[-1])
 
 
 class IdenticalPhaseScreensPath(PhaseScreensPath):
@@ -0,0 +1,147 @@
+import dataclasses
+import json
+import os
+
+import numpy as np
+from numpy.lib.format import open_memmap
+
+from pyatmosphere.gpu import get_array
+from pyatmosphere.grids import RectGrid
+from pyatmosphere.phase_screens import PhaseScreen, FFTPhaseScreen
+
+
+MANIFEST_NAME = "manifest.json"
+SCREENS_NAME = "screens.npy"
+# Peak bytes per pixel of a complex FFT screen during its generation
+_GENERATION_BYTES_PER_PIXEL = 32
+
+
+def _get_model_description(model):
+    """Model type and parameters without Cn2, the bank is scaled to Cn2 on sampling"""
+    params = dataclasses.asdict(model)
+    params.pop("Cn2")
+    return {"type": type(model).__name__, "params": params}
+
+
+class PhaseScreenBank:
+    """Pre-generated FFT screens of unit Cn2 * k**2 * thickness
+
+    The screens are stored in a memory-mapped .npy file next to a JSON manifest
+    of the model and grid they were generated for. They are `size_factor` times
+    larger than the grid, so that grid-sized windows at different offsets differ.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        with open(os.path.join(path, MANIFEST_NAME)) as f:
+            self.manifest = json.load(f)
+        self.screens = np.load(os.path.join(path, SCREENS_NAME), mmap_mode="r")
+
+    @classmethod
+    def create(cls, path, model, grid: RectGrid, count: int, size_factor: int = 2, subharmonics: int = 3, seed=None, memory_budget: int = 2**30):
+        """Generate `count` screens of the model for the grid into the directory `path`
+
+        Screens are generated in batches taking about `memory_budget` bytes at most.
+        """
+        os.makedirs(path, exist_ok=True)
+        resolution = size_factor * int(np.max(grid.resolution))
+        phase_screen = FFTPhaseScreen(subharmonics, dataclasses.replace(model, Cn2=1.0), thickness=1,
+                                      wvl=2 * np.pi, grid=RectGrid(resolution, grid.delta))
+        phase_screen.seed(np.random.SeedSequence(seed))
+        screens = open_memmap(os.path.join(path, SCREENS_NAME), mode="w+", dtype=np.float32,
+                              shape=(count, resolution, resolution))
+        batch_size = max(1, memory_budget // (_GENERATION_BYTES_PER_PIXEL * resolution**2))
+        # Real and imaginary parts of a complex FFT screen are independent screens
+        for start in range(0, count, 2 * batch_size):
+            batch = phase_screen.generate_phase_screen(batch_size=min(batch_size, (count - start + 1) // 2))
+            batch = get_array(batch)
+            batch = np.concatenate([batch.real, batch.imag])[:count - start]
+            screens[start:start + len(batch)] = batch
+        screens.flush()
+        del screens
+        manifest = {
+            "model": _get_model_description(model),
+            "resolution": resolution,
+            "delta": grid.delta,
+            "subharmonics": subharmonics,
+            "count": count,
+        }
+        with open(os.path.join(path, MANIFEST_NAME), "w") as f:
+            json.dump(manifest, f)
+        return cls(path)
+
+    def __len__(self):
+        return len(self.screens)
+
+    def is_compatible(self, model, grid: RectGrid):
+        return (self.manifest["model"] == json.loads(json.dumps(_get_model_description(model))) and
+                max(grid.resolution) <= self.manifest["resolution"] and
+                self.manifest["delta"] == grid.delta)
+
+
+class BankPhaseScreen(PhaseScreen):
+    """Screens sampled from a PhaseScreenBank instead of synthesized
+
+    Every sample takes a grid-sized window at a random offset of a random bank screen
+    with random flips and transposition, scaled by sqrt(Cn2 * k**2 * thickness).
+    With wind the sample is kept and its window is moved by the shift until `cache_clear`,
+    windows wrap periodically at the bank screen edges, seamlessly only without subharmonics.
+    """
+    _state_attributes = PhaseScreen._state_attributes + ("_cached_transform",)
+
+    def __init__(self, bank: PhaseScreenBank, *args, **kwargs):
+        self.bank = bank
+        super().__init__(*args, **kwargs)
+        self.cache_clear()
+
+    def cache_clear(self):
+        self._cached_transform = None
+
+    def _get_transform(self, batch_shape):
+        size = batch_shape or None
+        offsets = self.bank.manifest["resolution"] - np.array(self.grid.resolution[::-1]) + 1
+        return (get_array(self.rng.integers(len(self.bank), size=size)),
+                get_array(self.rng.integers(offsets, size=(*batch_shape, 2))),
+                get_array(self.rng.integers(2, size=(*batch_shape, 3))))
+
+    def _sample(self, index, offset, flips, shift, native=False):
+        xp = self.grid.get_array_module()
+        phase_screen = self.bank.screens[int(index)]
+        if flips[0]:
+            phase_screen = phase_screen[::-1]
+        if flips[1]:
+            phase_screen = phase_screen[:, ::-1]
+        if flips[2]:
+            phase_screen = phase_screen.T
+        offset = offset + np.rint(np.asarray(shift[::-1]) / self.grid.delta).astype(int)
+        rows, columns = np.arange(self.grid.resolution[1]), np.arange(self.grid.resolution[0])
+        if native:
+            rows, columns = np.fft.ifftshift(rows), np.fft.ifftshift(columns)
+        rows = (offset[0] + rows) % len(phase_screen)
+        columns = (offset[1] + columns) % len(phase_screen)
+        return xp.asarray(phase_screen[np.ix_(rows, columns)])
+
+    def generate_phase_screen(self, shift=(0, 0), wind: bool = False, batch_size: int = None, native: bool = False):
+        xp = self.grid.get_array_module()
+        if not self.bank.is_compatible(self.model, self.grid):
+            raise ValueError("The phase screen bank was generated for another model or grid")
+        batch_shape = (batch_size,) if batch_size else ()
+        transform = self._cached_transform if wind and self._cached_transform is not None else \
+            self._get_transform(batch_shape)
+        if wind:
+            self._cached_transform = transform
+        index, offset, flips = transform
+        if batch_shape:
+            phase_screen = xp.stack([self._sample(*t, shift, native) for t in zip(index, offset, flips)])
+        else:
+            phase_screen = self._sample(index, offset, flips, shift, native)
+        k = 2 * np.pi / self.wvl
+        return phase_screen * np.float32(np.sqrt(self.model.Cn2 * k**2 * self.thickness))
+
+    def generate_native(self, *args, **kwargs):
+        # The window is gathered in native order directly
+        return self.generate_phase_screen(*args, native=True, **kwargs)
+
+    def generator(self, *args, **kwargs):
+        while True:
+            yield self.generate(*args, **kwargs)
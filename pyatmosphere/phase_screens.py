@@ -1,14 +1,69 @@
+import dataclasses
+from functools import lru_cache
 import numpy as np
-from scipy.integrate import quad
 from typing import Tuple
 
-from pyatmosphere.grids import RectGrid
-from pyatmosphere.utils import Default, PolarDiscreteFunction, ifft2
+from pyatmosphere.gpu import get_xp, get_array, get_rng, get_fft
+from pyatmosphere.grids import RectGrid, RandLogPolarGrid
+from pyatmosphere.utils import Default, PolarDiscreteFunction, to_native_order
+from pyatmosphere.nufft import nufft2d1
+
+
+@lru_cache(maxsize=None)
+def _get_unit_annular_psd(model_type, model_params, points, f_min, f_max, nodes):
+    model = model_type(*model_params)
+    f = RandLogPolarGrid(points, f_min, f_max).base.astype(np.float64)
+    f_prev = np.insert(f, 0, 0)[:-1]
+    t, w = np.polynomial.legendre.leggauss(nodes)
+    # Gauss-Legendre nodes of every annulus, shape (points, nodes)
+    f_nodes = (f - f_prev)[:, None] / 2 * t + (f + f_prev)[:, None] / 2
+    xp = get_xp()
+    in_int_function = get_array((2 * np.pi)**2 * xp.asarray(f_nodes) *
+                                model.psd_phi_f(xp.asarray(f_nodes), 1, 1))
+    return 2 * np.pi * (f - f_prev) / 2 * (in_int_function @ w)
+
+
+def get_annular_psd(model, k, thickness, f_grid, nodes=32):
+    """Return the phase PSD integrated over the annuli of the RandLogPolarGrid
+
+    The integrals are cached per model shape and grid for Cn2 = k = thickness = 1
+    and rescaled, since the phase PSD is proportional to Cn2 * k**2 * thickness.
+    """
+    unit_model = dataclasses.replace(model, Cn2=1)
+    unit_psd = _get_unit_annular_psd(type(unit_model), dataclasses.astuple(unit_model),
+                                     f_grid.points, f_grid.f_min, f_grid.f_max, nodes)
+    return model.Cn2 * k**2 * thickness * unit_psd
+
+
+SYNTHESIS_METHODS = ("direct", "nufft")
+
+
+def synthesize_direct(value, fx, fy, x, y):
+    """Sum value * exp(2 pi i (fx x + fy y)) over the spectrum points, O(Nx Ny P)
+
+    value of shape (..., P), fx of shape (..., 1, P) and fy of shape (..., P, 1)
+    """
+    xp = get_xp()
+    return (value[..., None, :] * xp.exp(1j * 2 * xp.pi * y @ xp.swapaxes(fy, -1, -2))) @ \
+        xp.exp(1j * 2 * xp.pi * xp.swapaxes(fx, -1, -2) @ x)
+
+
+def synthesize_nufft(grid, value, fx, fy, shift=(0, 0)):
+    """The same sum on the shifted grid by a type-1 NUFFT, O(P + N**2 log N)"""
+    xp = get_xp()
+    fx, fy = fx[..., 0, :], fy[..., :, 0]
+    value = value * xp.exp(1j * 2 * xp.pi * (fx * shift[0] + fy * shift[1]))
+    ny, nx = grid.get_NxNy()
+    return nufft2d1(value, 2 * xp.pi * fx * grid.delta, 2 * xp.pi * fy * grid.delta, nx.ravel(), ny.ravel())
 
 
 class PhaseScreen():
     wvl = Default("channel.source.wvl")
     grid = Default("channel.grid")
+    # Attributes changing between generated screens, saved by simulation checkpoints
+    _state_attributes: Tuple[str, ...] = ("_rng",)
+    seed_sequence: np.random.SeedSequence = None
+    _rng = None
 
     def __init__(self, model, thickness=None, wvl=None, grid=None):
         self.model = model
@@ -18,15 +73,37 @@ class PhaseScreen():
         if grid:
             self.grid = grid
 
+    @property
+    def rng(self):
+        """Generator of the screen spawned by `Channel.seed` or seeded from fresh entropy"""
+        if self._rng is None:
+            self._rng = get_rng(self.seed_sequence or np.random.SeedSequence())
+        return self._rng
+
+    def seed(self, seed_sequence: np.random.SeedSequence):
+        self.seed_sequence = seed_sequence
+        self._rng = None
+
     def generate_phase_screen(self):
         """Return complex phase screen"""
         raise NotImplementedError
 
+    def get_state(self) -> dict:
+        return {name: getattr(self, name, None) for name in self._state_attributes}
+
+    def set_state(self, state: dict):
+        for name, value in state.items():
+            setattr(self, name, value)
+
     def generate(self, complex=False, *args, **kwargs):
         if complex:
             return self.generate_phase_screen(*args, **kwargs)
         return self.generate_phase_screen(*args, **kwargs).real
 
+    def generate_native(self, *args, **kwargs):
+        """Return a real screen in native FFT order, see utils.to_native_order"""
+        return to_native_order(self.generate(*args, **kwargs))
+
     def generator(self, *args, **kwargs):
         while True:
             ps = self.generate(complex=True, *args, **kwargs)
@@ -38,38 +115,101 @@ class FFTPhaseScreen(PhaseScreen):
     def __init__(self, subharmonics, *args, **kwargs):
         self.subharmonics = subharmonics
         super().__init__(*args, **kwargs)
+        # Shallow copies of the screen share the cache
+        self._cache = {}
 
-    def generate_phase_screen(self):
+    def _get_subharmonic_bases(self, native=False):
+        """Return x-bases (levels, 3, Nx) and y-bases (Ny, 3 * levels) of subharmonic phasors"""
         xp = self.grid.get_array_module()
-
-        def get_cn_coefficients(cn_f_grid):
-            cn = (xp.random.normal(size=cn_f_grid.shape) + 1j * xp.random.normal(size=cn_f_grid.shape)).astype(np.complex64) * \
-                xp.sqrt(self.model.psd_phi_f(cn_f_grid.get_rho(), 2 * xp.pi /
-                        self.wvl, self.thickness)) * 2 * xp.pi * cn_f_grid.delta
-            cn[cn_f_grid.origin_index] = 0
-            return cn
+        key = ("subharmonic_bases", self.grid.resolution, self.grid.delta, self.subharmonics, native, xp.__name__)
+        if key not in self._cache:
+            f_grid = self.grid.get_f_grid()
+            f = xp.concatenate([RectGrid(3, f_grid.delta / 3**(sh + 1)).get_x()[0]
+                               for sh in range(self.subharmonics)])
+            x, y = self.grid.get_xy()
+            if native:
+                x, y = xp.fft.ifftshift(x, axes=-1), xp.fft.ifftshift(y, axes=0)
+            x_bases = xp.exp(1j * 2 * xp.pi * f[:, None] * x)
+            y_bases = xp.exp(1j * 2 * xp.pi * y * f[None, :])
+            self._cache[key] = (x_bases.reshape((self.subharmonics, 3, -1)), y_bases)
+        return self._cache[key]
+
+    def _get_amplitudes(self):
+        """Return the spectral filter in FFT order and the subharmonic filter (levels, 3, 3)
+
+        Only the last parameters are kept, the filter is rebuilt when they change.
+        """
+        xp = self.grid.get_array_module()
+        key = (type(self.model), dataclasses.astuple(self.model), self.wvl, self.thickness,
+               self.grid.resolution, self.grid.delta, self.subharmonics, xp.__name__)
+        cached_key, amplitudes = self._cache.get("amplitudes", (None, None))
+        if cached_key == key:
+            return amplitudes
 
         f_grid = self.grid.get_f_grid()
-        phase_screen = ifft2(get_cn_coefficients(f_grid), 1)
+        k = 2 * xp.pi / self.wvl
+        amplitude = xp.sqrt(self.model.psd_phi_f(f_grid.get_rho(), k, self.thickness)) * 2 * xp.pi * f_grid.delta
+        amplitude[f_grid.origin_index] = 0
+        # The centered ifft2 normalization, the output shift is dropped as screens are stationary
+        amplitude = to_native_order(amplitude * f_grid.resolution[0]**2).astype(np.float32)
+
+        sh_amplitude = None
+        if self.subharmonics:
+            # All levels at once: 3x3 sub-grids with deltas f_grid.delta / 3**(sh + 1)
+            sh_f_grid = RectGrid(3, 1)
+            sh_delta = f_grid.delta / 3**xp.arange(1, self.subharmonics + 1, dtype=np.float32)[:, None, None]
+            sh_amplitude = xp.sqrt(self.model.psd_phi_f(sh_f_grid.get_rho() * sh_delta, k,
+                                                        self.thickness)) * 2 * xp.pi * sh_delta
+            sh_amplitude[(..., *sh_f_grid.origin_index)] = 0
+            sh_amplitude = sh_amplitude.astype(np.float32)
+
+        self._cache["amplitudes"] = (key, (amplitude, sh_amplitude))
+        return amplitude, sh_amplitude
+
+    def _get_cn(self, amplitude, batch_shape):
+        """Complex normal coefficients from a single float32 draw viewed as complex64"""
+        cn = self.rng.standard_normal((*batch_shape, *amplitude.shape, 2), dtype=np.float32)
+        return cn.view(np.complex64)[..., 0] * amplitude
+
+    def generate_phase_screen(self, batch_size: int = None, native: bool = False):
+        """native returns the screen in native FFT order, only the subharmonics depend on the order
+
+        The stationary FFT part is the same array in both orders, so for the same random draws
+        a native screen is a rolled version of the centered one, not to_native_order of it.
+        """
+        xp = self.grid.get_array_module()
+        batch_shape = (batch_size,) if batch_size else ()
+        amplitude, sh_amplitude = self._get_amplitudes()
+        phase_screen = get_fft().ifft2(self._get_cn(amplitude, batch_shape), axes=(-2, -1))
+
+        if self.subharmonics:
+            cn = self._get_cn(sh_amplitude, batch_shape)
+            # sum_ij cn[i, j] * exp(2 pi i (f_i x + f_j y)) = y_bases @ cn.T @ x_bases for every level
+            x_bases, y_bases = self._get_subharmonic_bases(native)
+            coefficients = (xp.swapaxes(cn, -1, -2) @ x_bases).reshape(
+                (*batch_shape, 3 * self.subharmonics, -1))
+            phase_screen = phase_screen + y_bases @ coefficients
 
-        for sh in range(self.subharmonics):
-            sh_f_grid = RectGrid(3, f_grid.delta / 3**(sh + 1))
-            cn = get_cn_coefficients(sh_f_grid)
+        return phase_screen - xp.mean(phase_screen, axis=(-2, -1), keepdims=True)
 
-            # fx, fy = sh_f_grid.get_xy()
-            # return xp.exp(1j * 2 * xp.pi * self.grid.get_y() @ fy.T) @ cn @ xp.exp(1j * 2 * xp.pi * fx.T @ self.grid.get_x())
-            f = sh_f_grid.get_x()
-            for i in range(sh_f_grid.resolution[0]):
-                for j in range(sh_f_grid.resolution[1]):
-                    phase_screen = phase_screen + cn[i, j] * xp.exp(1j * 2 * xp.pi * (
-                        f[0, i] * self.grid.get_x() + f[0, j] * self.grid.get_y()))
+    def generate_native(self, *args, **kwargs):
+        """Return a real screen in native FFT order with the statistics of the shifted centered screen
 
-        return phase_screen - xp.mean(phase_screen)
+        It differs from to_native_order(self.generate()) for the same random draws, see generate_phase_screen.
+        """
+        return self.generate_phase_screen(*args, native=True, **kwargs).real
 
 
 class SSPhaseScreen(PhaseScreen):
-    def __init__(self, f_grid, *args, **kwargs):
+    _state_attributes = PhaseScreen._state_attributes + (
+        "_cached_spectrum", "_cached_phase_screen", "_cached_phase_screen_shift")
+
+    def __init__(self, f_grid, *args, method: str = "direct", **kwargs):
+        """method "nufft" synthesizes screens in O(points + N**2 log N) instead of O(N**2 points)"""
         super().__init__(*args, **kwargs)
+        if method not in SYNTHESIS_METHODS:
+            raise ValueError("Available values for method: 'direct' and 'nufft'")
+        self.method = method
         self.f_grid = f_grid
         self._psd = None
         self.cache_clear()
@@ -80,35 +220,41 @@ class SSPhaseScreen(PhaseScreen):
         self._cached_phase_screen_shift = 0
 
     def _get_psd(self):
-        if self._psd is not None:
-            return self._psd
-        xp = self.grid.get_array_module()
-        f = self.f_grid.base
-        def in_int_function(f): return (
-            2 * np.pi)**2 * f * self.model.psd_phi_f(f, 2 * xp.pi / self.wvl, self.thickness)
-        self._psd = xp.array([2 * np.pi * quad(in_int_function, f[i - 1] if i != 0 else 0, f[i])[0]
-                             for i in range(self.f_grid.points)], dtype=np.float32)
-        return self._psd
-
-    def _get_spectrum(self, use_cached_spectrum):
+        key = (type(self.model), dataclasses.astuple(self.model), self.wvl,
+               self.thickness, dataclasses.astuple(self.f_grid))
+        if self._psd is None or self._psd[0] != key:
+            xp = self.grid.get_array_module()
+            psd = get_annular_psd(self.model, 2 * np.pi / self.wvl, self.thickness, self.f_grid)
+            self._psd = (key, xp.array(psd, dtype=np.float32))
+        return self._psd[1]
+
+    def _get_spectrum(self, use_cached_spectrum, batch_size=None):
         xp = self.grid.get_array_module()
         if use_cached_spectrum and self._cached_spectrum:
             return self._cached_spectrum
         else:
+            batch_shape = (batch_size,) if batch_size else ()
             spectrum = PolarDiscreteFunction(
-                rho=self.f_grid.get_rho(),
-                theta=self.f_grid.get_theta(),
-                value=(xp.array([1, 1j]) @ xp.random.normal(size=(2, self.f_grid.points))
+                rho=self.f_grid.get_rho(batch_size, self.rng),
+                theta=self.f_grid.get_theta(batch_size, self.rng),
+                value=(xp.array([1, 1j]) @ self.rng.standard_normal((*batch_shape, 2, self.f_grid.points), dtype=np.float32)
                        ).astype(np.complex64) * xp.sqrt(self._get_psd())
             )
             if use_cached_spectrum and not self._cached_spectrum:
                 self._cached_spectrum = spectrum
             return spectrum
 
-    def generate_phase_screen(self, shift: Tuple[float, float] = (0, 0), wind: bool = False):
+    def generate_phase_screen(self, shift: Tuple[float, float] = (0, 0), wind: bool = False, batch_size: int = None):
         xp = self.grid.get_array_module()
-        spectrum = self._get_spectrum(use_cached_spectrum=wind)
+        spectrum = self._get_spectrum(use_cached_spectrum=wind, batch_size=batch_size)
         fx, fy = self.f_grid.get_xy(spectrum.rho, spectrum.theta)
+        if self.method == "nufft":
+            phase_screen = synthesize_nufft(self.grid, spectrum.value, fx, fy, shift)
+            if wind:
+                self._cached_phase_screen = phase_screen
+                self._cached_phase_screen_shift = shift[0]
+            return phase_screen
+
         x = self.grid.get_x() + shift[0]
         y = self.grid.get_y() + shift[1]
 
@@ -122,13 +268,12 @@ class SSPhaseScreen(PhaseScreen):
 #       print(f"cached shift: {self._cached_phase_screen_shift}, Shift: {shift[0]}")
 #       print(f"Split edge: {cached_edge_index}")
 
-        phase_screen = spectrum.value * \
-            xp.exp(1j * 2 * xp.pi * y @ fy.T) @ xp.exp(1j * 2 * xp.pi * fx.T @ x)
+        phase_screen = synthesize_direct(spectrum.value, fx, fy, x, y)
 
         if cached_edge_index:
             #         print(self._cached_phase_screen[:, self.grid.resolution[0] - cached_edge_index:].shape, phase_screen.shape)
             phase_screen = xp.append(
-                self._cached_phase_screen[:, self.grid.resolution[0] - cached_edge_index:], phase_screen, axis=1)
+                self._cached_phase_screen[..., self.grid.resolution[0] - cached_edge_index:], phase_screen, axis=-1)
 
         if wind:
             self._cached_phase_screen = phase_screen
@@ -137,6 +282,8 @@ class SSPhaseScreen(PhaseScreen):
 
 
 class WindSSPhaseScreen(SSPhaseScreen):
+    _state_attributes = SSPhaseScreen._state_attributes + ("time",)
+
     def __init__(self, wind_speed: float, *args, **kwargs):
         super().__init__(*args, **kwargs)
         self.wind_speed = wind_speed
@@ -152,63 +299,248 @@ class WindSSPhaseScreen(SSPhaseScreen):
 
 
 class SUPhaseScreen(PhaseScreen):
-    def __init__(self, f_grid, *args, **kwargs):
+    def __init__(self, f_grid, *args, method: str = "direct", **kwargs):
+        """method "nufft" synthesizes screens in O(points + N**2 log N) instead of O(N**2 points)"""
+        if method not in SYNTHESIS_METHODS:
+            raise ValueError("Available values for method: 'direct' and 'nufft'")
+        self.method = method
         self.f_grid = f_grid
         super().__init__(*args, **kwargs)
         self._delta_k_base = None
 
     @property
     def delta_k_base(self):
+        """Areas of the frequency annuli, cached per f_grid"""
+        key = dataclasses.astuple(self.f_grid)
+        if self._delta_k_base is None or self._delta_k_base[0] != key:
+            xp = self.grid.get_array_module()
+            self._delta_k_base = (key, (2 * xp.pi)**2 * xp.array((self.f_grid.base**2 - np.insert(
+                self.f_grid.base, 0, 0)[:-1]**2), dtype=np.float32))
+        return self._delta_k_base[1]
+
+    def get_amplitude(self, rho):
+        """Standard deviations of the complex coefficients at the frequencies rho"""
         xp = self.grid.get_array_module()
-        if self._delta_k_base is None:
-            self._delta_k_base = (2 * xp.pi)**2 * xp.array((self.f_grid.base**2 - np.insert(
-                self.f_grid.base, 0, 0)[:-1]**2), dtype=np.float32)
-        return self._delta_k_base
+        return xp.sqrt(self.model.psd_phi_f(rho, 2 * xp.pi / self.wvl,
+                       self.thickness) * xp.pi * self.delta_k_base)
 
-    def generate_phase_screen(self):
+    def synthesize(self, cn, rho, theta, shift=(0, 0)):
+        """Scale the spectral basis by the coefficients cn, no dense diagonal is built"""
+        fx, fy = self.f_grid.get_xy(rho, theta)
+        if self.method == "nufft":
+            return synthesize_nufft(self.grid, cn, fx, fy, shift)
+        return synthesize_direct(cn, fx, fy, self.grid.get_x() + shift[0], self.grid.get_y() + shift[1])
+
+    def generate_phase_screen(self, batch_size: int = None):
         xp = self.grid.get_array_module()
+        batch_shape = (batch_size,) if batch_size else ()
 
-        rho = self.f_grid.get_rho()
-        theta = self.f_grid.get_theta()
+        rho = self.f_grid.get_rho(batch_size, self.rng)
+        theta = self.f_grid.get_theta(batch_size, self.rng)
 
-        cn = (xp.array([1, 1j]) @ xp.random.normal(size=(2, self.f_grid.points))).astype(np.complex64) * \
-            xp.sqrt(self.model.psd_phi_f(rho, 2 * xp.pi / self.wvl,
-                    self.thickness) * xp.pi * self.delta_k_base)
+        cn = (xp.array([1, 1j]) @ self.rng.standard_normal((*batch_shape, 2, self.f_grid.points), dtype=np.float32)).astype(np.complex64) * \
+            self.get_amplitude(rho)
+        return self.synthesize(cn, rho, theta)
 
-        fx, fy = self.f_grid.get_xy(rho, theta)
-        return xp.exp(1j * 2 * xp.pi * self.grid.get_y() @ fy.T) @ xp.diag(cn) @ xp.exp(1j * 2 * xp.pi * fx.T @ self.grid.get_x())
 
+class WindSUPhaseScreen(SUPhaseScreen):
+    _state_attributes = PhaseScreen._state_attributes + ("cnp", "rho", "theta", "iteration", "_amplitude")
 
-class WindSUPhaseScreen(PhaseScreen):
     def __init__(self, f_grid, speed, *args, **kwargs):
-        self.f_grid = f_grid
         self.speed = speed
-        super().__init__(*args, **kwargs)
+        super().__init__(f_grid, *args, **kwargs)
         self.cnp = None
+        self._amplitude = None
 
     def generate_cn(self):
-        self.rho = self.f_grid.get_rho()
-        self.theta = self.f_grid.get_theta()
+        self.rho = self.f_grid.get_rho(rng=self.rng)
+        self.theta = self.f_grid.get_theta(rng=self.rng)
         xp = self.grid.get_array_module()
-        self.cnp = (xp.array([1, 1j]) @ xp.random.normal(size=(2,
-                    self.f_grid.points)).astype(np.complex64))
+        self.cnp = (xp.array([1, 1j]) @ self.rng.standard_normal((2,
+                    self.f_grid.points), dtype=np.float32).astype(np.complex64))
         self.iteration = 0
+        self._amplitude = None
+
+    def get_cn(self):
+        """Coefficients of the current realization, the amplitudes are computed once per rho and model"""
+        key = (type(self.model), dataclasses.astuple(self.model), self.wvl,
+               self.thickness, dataclasses.astuple(self.f_grid))
+        if self._amplitude is None or self._amplitude[0] != key:
+            self._amplitude = (key, self.get_amplitude(self.rho))
+        return self.cnp * self._amplitude[1]
 
     def generate_phase_screen(self):
         if self.cnp is None:
             self.generate_cn()
 
-        xp = self.grid.get_array_module()
-
-        cn = self.cnp * \
-            xp.sqrt(self.model.psd_phi_f(self.rho, 2 * xp.pi / self.wvl, self.thickness) *
-                    xp.pi * (2 * xp.pi)**2 * xp.array(self.f_grid.base**2 - np.insert(self.f_grid.base, 0, 0)[:-1]**2, dtype=np.float32))
-
-        fx, fy = self.f_grid.get_xy(self.rho, self.theta)
         offset = self.iteration * self.speed
         self.iteration += 1
-        return xp.exp(1j * 2 * xp.pi * self.grid.get_y() @ fy.T) @ xp.diag(cn) @ xp.exp(1j * 2 * xp.pi * fx.T @ (self.grid.get_x() + offset))
+        return self.synthesize(self.get_cn(), self.rho, self.theta, shift=(offset, 0))
 
     def generator(self):
+        """Yield frames of the frozen flow keeping the bases and coefficients between frames
+
+        Every frame rotates the coefficients by exp(2 pi i fx speed t), O(N P).
+        For other speeds every frame is then synthesized by the full (N, P) @ (P, N) product, O(N**2 P).
+        When speed is a whole number of pixels the frame is the previous one shifted, O(N**2),
+        and only the entering columns are synthesized, O(N P speed / delta).
+        """
+        if self.method == "nufft":
+            while True:
+                yield self.generate(complex=False)
+
+        xp = self.grid.get_array_module()
+        if self.cnp is None:
+            self.generate_cn()
+        fx, fy = self.f_grid.get_xy(self.rho, self.theta)
+        cn_ey = self.get_cn() * xp.exp(1j * 2 * xp.pi * self.grid.get_y() @ fy.T)
+        ex = xp.exp(1j * 2 * xp.pi * fx.T @ self.grid.get_x())
+        # Phases of long series are reduced modulo 1 in double precision
+        fx = fx[0].astype(np.float64)
+
+        pixels = self.speed / self.grid.delta
+        step = int(round(pixels)) if abs(pixels - round(pixels)) < 1e-6 * max(1, abs(pixels)) else None
+        phase_screen = None
+        while True:
+            rotation = xp.exp(1j * 2 * xp.pi * ((fx * self.iteration * self.speed) % 1)).astype(np.complex64)
+            if phase_screen is None or step is None or abs(step) >= ex.shape[1]:
+                phase_screen = (cn_ey * rotation) @ ex
+            elif step > 0:
+                phase_screen = xp.concatenate([phase_screen[:, step:], (cn_ey * rotation) @ ex[:, -step:]], axis=1)
+            elif step < 0:
+                phase_screen = xp.concatenate([(cn_ey * rotation) @ ex[:, :-step], phase_screen[:, :step]], axis=1)
+            self.iteration += 1
+            yield phase_screen.real
+
+
+class InfinitePhaseScreen(PhaseScreen):
+    """Frozen flow screen of unlimited length extruded row by row
+
+    Every new row is drawn from its distribution conditioned on stencil points z of the screen,
+    x = A z + B b, with A and B from the numeric phase covariance of the model.
+    The stencil holds the nearest `stencil_rows` rows, then the rows 2**n + 1 back and
+    the farthest one with columns spaced by half their distance, so the large scales
+    along the extrusion keep their power (Assemat F., Wilson R. W., Gendron E., Opt. Express 14, 988 (2006)).
+    The initial screen is extruded the same way from its first row and has the statistics of moved screens.
+    A row or column costs O(N P) for P ~ 4 N stencil points, shifts are rounded to whole pixels.
+
+    Only `generate` and `generator` without a shift advance the screen by velocity * time_step,
+    every frame extruding just the entering rows and columns.
+    Simulation passes the absolute shift (0, time) instead and calls `cache_clear` for every sample,
+    so each sample extrudes a fresh screen, O(N**2 P), and its time points move it
+    by the differences of their shifts, velocity and time_step are not used there.
+    """
+    _state_attributes = PhaseScreen._state_attributes + ("_phase_screen", "_position", "_pixels")
+
+    def __init__(self, velocity: Tuple[float, float] = (0, 0), time_step: float = 1, *args,
+                 stencil_rows: int = 3, **kwargs):
+        self.velocity = velocity
+        self.time_step = time_step
+        self.stencil_rows = stencil_rows
+        super().__init__(*args, **kwargs)
+        # Shallow copies of the screen share the operators
+        self._operators = {}
+        self.cache_clear()
+
+    def cache_clear(self):
+        self._phase_screen = None
+        self._position = np.zeros(2)
+        self._pixels = np.zeros(2, dtype=int)
+
+    def _get_stencil(self, available, depth):
+        """Return the distances back from a new row of the stencil rows
+
+        The nearest `stencil_rows` rows are followed by the rows 2**n + 1 back
+        and the farthest row, up to `depth` rows and the `available` ones.
+        """
+        distances = set(range(1, self.stencil_rows + 1)) | {depth}
+        distances |= {2**n + 1 for n in range(1, depth.bit_length())}
+        return tuple(sorted(d for d in distances if d <= min(available, depth)))
+
+    def _get_columns(self, distance, length):
+        """Return the columns of a stencil row, their spacing grows with the distance"""
+        spacing = 1 if distance <= self.stencil_rows else max(1, (distance - 1) // 2)
+        return np.unique(np.round(np.linspace(0, length - 1, (length - 1) // spacing + 1)).astype(int))
+
+    def _get_operators(self, length, distances):
+        """Return A (length, stencil points) and B (length, length) of a new row"""
+        xp = self.grid.get_array_module()
+        key = (length, distances, self.stencil_rows, type(self.model), dataclasses.astuple(self.model),
+               self.wvl, self.thickness, self.grid.delta, xp.__name__)
+        if key not in self._operators:
+            dx = np.arange(length)
+            columns = [self._get_columns(d, length) for d in distances]
+            # Stencil point (d, j) is the column j of the row d back from the new row
+            d = np.concatenate([np.zeros(0, dtype=int)] +
+                               [np.full(len(c), distance) for distance, c in zip(distances, columns)])
+            j = np.concatenate([np.zeros(0, dtype=int)] + columns)
+            # The covariance is evaluated only for the row distances the points have
+            rows = np.unique(np.concatenate([[0], d, abs(d[:, None] - d).ravel()]))
+            covariance = self.model.covariance_phi_numeric(
+                self.grid.delta * np.hypot(rows[:, None], dx), 2 * np.pi / self.wvl, self.thickness)
+            row_index = np.zeros(rows[-1] + 1, dtype=int)
+            row_index[rows] = np.arange(len(rows))
+            czz = covariance[row_index[abs(d[:, None] - d)], abs(j[:, None] - j)]
+            cxz = covariance[row_index[d], abs(dx[:, None] - j)]
+            cxx = covariance[0, abs(dx[:, None] - dx)]
+            a = np.linalg.lstsq(czz, cxz.T, rcond=1e-12)[0].T if distances else np.zeros((length, 0))
+            w, v = np.linalg.eigh(cxx - a @ cxz.T)
+            b = v * np.sqrt(np.clip(w, 0, None))
+            self._operators[key] = (xp.asarray(a, dtype=np.float32), xp.asarray(b, dtype=np.float32),
+                                    [(distance, xp.asarray(c)) for distance, c in zip(distances, columns)])
+        return self._operators[key]
+
+    def _extrude(self, phase_screen, rows):
+        """Return the screen with rows appended to its bottom
+
+        The stencil reaches back the screen length, or `rows` for an empty screen.
+        """
+        xp = self.grid.get_array_module()
+        length = phase_screen.shape[1]
+        depth = len(phase_screen) or rows
+        screen = list(phase_screen)
+        for _ in range(rows):
+            a, b, stencil = self._get_operators(length, self._get_stencil(len(screen), depth))
+            row = b @ self.rng.standard_normal(length, dtype=np.float32)
+            if stencil:
+                row += a @ xp.concatenate([screen[-d][columns] for d, columns in stencil])
+            screen.append(row)
+        return xp.stack(screen)
+
+    def _move(self, dx, dy):
+        xp = self.grid.get_array_module()
+        phase_screen = self._phase_screen
+        if dy > 0:
+            phase_screen = self._extrude(phase_screen, dy)[dy:]
+        elif dy < 0:
+            phase_screen = self._extrude(phase_screen[::-1], -dy)[-dy:][::-1]
+        if dx > 0:
+            phase_screen = self._extrude(phase_screen.T, dx)[dx:].T
+        elif dx < 0:
+            phase_screen = self._extrude(phase_screen[:, ::-1].T, -dx)[-dx:].T[:, ::-1]
+        self._phase_screen = xp.ascontiguousarray(phase_screen)
+
+    def generate_phase_screen(self, shift: Tuple[float, float] = None, wind: bool = False, batch_size: int = None):
+        """Return the screen seen at the absolute `shift` or advanced by velocity * time_step
+
+        The first call after `cache_clear` extrudes the whole screen, later calls only the rows
+        and columns entering between the previous and the new position.
+        """
+        if batch_size:
+            raise ValueError("Available values for batch_size: None, InfinitePhaseScreen generates one screen at a time")
+        if self._phase_screen is None:
+            xp = self.grid.get_array_module()
+            ny, nx = self.grid.resolution[1], self.grid.resolution[0]
+            self._phase_screen = self._extrude(xp.zeros((0, nx), dtype=np.float32), ny)
+        elif shift is None:
+            self._position = self._position + np.asarray(self.velocity) * self.time_step
+        if shift is not None:
+            self._position = np.asarray(shift, dtype=float)
+        pixels = np.rint(self._position / self.grid.delta).astype(int)
+        self._move(*(pixels - self._pixels))
+        self._pixels = pixels
+        return self._phase_screen
+
+    def generator(self, *args, **kwargs):
         while True:
-            yield self.generate(complex=False)
+            yield self.generate(*args, **kwargs)
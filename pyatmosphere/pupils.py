@@ -1,13 +1,74 @@
-from dataclasses import dataclass
+from dataclasses import dataclass, field
+from typing import Sequence
+
+import numpy as np
+
+from pyatmosphere.gpu import get_fft
 
 
 @dataclass
 class CirclePupil:
     radius: float
+    # The last mask and the grid, radius and shift it was built for
+    _mask: tuple = field(default=None, init=False, repr=False, compare=False)
+    _spectrum: tuple = field(default=None, init=False, repr=False, compare=False)
 
     def get_pupil(self, shift=(0, 0)):
-        x, y = self.channel.grid.get_xy()
-        return ((x - shift[0])**2 + (y + shift[1])**2 <= (self.radius)**2)
+        grid = self.channel.grid
+        key = (grid.resolution, grid.delta, self.radius, tuple(shift), grid.get_array_module().__name__)
+        if self._mask is None or self._mask[0] != key:
+            x, y = grid.get_xy()
+            self._mask = (key, (x - shift[0])**2 + (y + shift[1])**2 <= (self.radius)**2)
+        return self._mask[1]
+
+    def get_spectrum(self):
+        """Conjugated rfft2 of the centered mask zero-padded to twice the grid, for cross-correlations"""
+        grid = self.channel.grid
+        xp = grid.get_array_module()
+        key = (grid.resolution, grid.delta, self.radius, xp.__name__)
+        if self._spectrum is None or self._spectrum[0] != key:
+            mask = self.get_pupil().astype(np.float32)
+            mask = xp.pad(mask, ((0, mask.shape[0]), (0, mask.shape[1])))
+            self._spectrum = (key, xp.conj(get_fft().rfft2(mask)))
+        return self._spectrum[1]
 
     def output(self, input, **kwargs):
         return input * self.get_pupil(**kwargs)
+
+
+@dataclass
+class MultiCirclePupil:
+    """Concentric circular apertures measured by a single reduction
+
+    `eta` returns the power through every radius as intensity @ weights, where
+    weights[p, j] * delta**2 is the covered part of pixel p by the circle j.
+    With `subpixels` > 1 the coverage is sampled on subpixels x subpixels points per pixel,
+    which anti-aliases the masks.
+    """
+    radii: Sequence[float]
+    subpixels: int = 1
+    _weights: tuple = field(default=None, init=False, repr=False, compare=False)
+
+    def get_weights(self, grid, shift=(0, 0)):
+        """Return flat indices of the pixels touching the largest circle and their weights (pixels, radii)"""
+        xp = grid.get_array_module()
+        key = (grid.resolution, grid.delta, tuple(self.radii), self.subpixels, tuple(shift), xp.__name__)
+        if self._weights is None or self._weights[0] != key:
+            x, y = grid.get_xy()
+            x, y = xp.broadcast_arrays(x - shift[0], y + shift[1])
+            r_max = max(self.radii) + grid.delta / np.sqrt(2)
+            index = xp.flatnonzero(x**2 + y**2 <= r_max**2)
+            offsets = ((xp.arange(self.subpixels, dtype=np.float32) + 0.5) / self.subpixels - 0.5) * grid.delta
+            sub_x = x.ravel()[index][:, None, None] + offsets[None, None, :]
+            sub_y = y.ravel()[index][:, None, None] + offsets[None, :, None]
+            rho2 = (sub_x**2 + sub_y**2).reshape((len(index), -1, 1))
+            radii2 = xp.asarray(self.radii, dtype=np.float32)**2
+            weights = (rho2 <= radii2).mean(axis=1, dtype=np.float32) * np.float32(grid.delta**2)
+            self._weights = (key, (index, weights))
+        return self._weights[1]
+
+    def eta(self, channel, output, shift=(0, 0)):
+        """Return the transmitted power of the field through every radius, shape (..., len(radii))"""
+        index, weights = self.get_weights(channel.grid, shift)
+        intensity = abs(output.reshape((*output.shape[:-2], -1))[..., index])**2
+        return intensity @ weights
@@ -1,6 +1,6 @@
 from .result import Result
 from .simulation import Simulation
-from .measure import Measure
+from .measure import Measure, mutates_input
 
 from .beam import BeamResult, BeamPropagationResult
 from .si import SIResult
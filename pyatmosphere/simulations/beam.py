@@ -2,35 +2,30 @@ import numpy as np
 from typing import Tuple, Sequence
 from matplotlib import pyplot as plt
 
-from pyatmosphere.measures import I, mean_x, mean_y, mean_x2, mean_xy, mean_y2  # , mean_r, mean_r2
+from pyatmosphere.measures import beam_moments  # , mean_r, mean_r2
 from pyatmosphere.theory.atmosphere.beam_wandering import get_r_bw
 from pyatmosphere.theory.atmosphere.long_term import get_numeric_w_LT
 from pyatmosphere.gpu import get_array
 
-from pyatmosphere.simulations.measure import Measure
+from pyatmosphere.simulations.measure import Measure, RunningMoments
 from pyatmosphere.simulations.result import Result
 
 
 class BeamResult(Result):
     def __init__(self, channel, **kwargs):
         measures = [
-            Measure(channel, "atmosphere", mean_x),
-            Measure(channel, "atmosphere", mean_y),
-            Measure(channel, "atmosphere", mean_x2),
-            Measure(channel, "atmosphere", mean_xy),
-            Measure(channel, "atmosphere", mean_y2),
-            Measure(channel, "atmosphere", self.mean_x2_r, name="mean_x2_r"),
+            Measure(channel, "atmosphere", beam_moments, item=item)
+            for item in ("mean_x", "mean_y", "mean_x2", "mean_xy", "mean_y2", "mean_x2_r")
         ]
         super().__init__(channel, measures, **kwargs)
 
-    def mean_x2_r(self, channel, output):
-        r0 = np.sqrt(self.measures[0].iteration_data **
-                     2 + self.measures[1].iteration_data**2)
-        cosXi = self.measures[0].iteration_data / r0
-        sinXi = self.measures[1].iteration_data / r0
-        rotated_x2_r = (channel.grid.get_x() * cosXi +
-                        ((-1) * channel.grid.get_y()) * sinXi)**2
-        return ((I(channel, output=output) * rotated_x2_r).sum(axis=(-1, -2)) * channel.grid.delta**2).item()
+    def init_statistics(self):
+        return {"bw2": RunningMoments(), "lt2": RunningMoments(), "st2": RunningMoments()}
+
+    def get_statistics_samples(self):
+        bw2 = self.measures[0].iteration_data**2
+        lt2 = 4 * self.measures[2].iteration_data
+        return {"bw2": bw2, "lt2": lt2, "st2": lt2 - 4 * bw2}
 
     @property
     def bw2(self) -> Sequence[float]:
@@ -46,29 +41,28 @@ class BeamResult(Result):
     def st2(self) -> Sequence[float]:
         return self.lt2 - 4 * self.bw2
 
+    def get_root_mean(self, name) -> Tuple[float, float]:
+        """Root of the mean of bw2, lt2 or st2 and its error"""
+        if self.statistics is not None:
+            moments = self.statistics[name]
+            mean, std, count = moments.mean, moments.std(), moments.count
+        else:
+            values = getattr(self, name)
+            mean, std, count = values.mean(), values.std(ddof=1), len(values)
+        root_mean = np.sqrt(mean)
+        return root_mean, std / np.sqrt(count) / 2 / root_mean
+
     @property
     def bw(self) -> Tuple[float, float]:
-        bw2 = self.bw2
-        bw_mean = np.sqrt(bw2.mean())
-        Dbw2 = bw2.std(ddof=1)/np.sqrt(len(bw2))
-        Dbw = Dbw2 / 2 / bw_mean
-        return bw_mean, Dbw
+        return self.get_root_mean("bw2")
 
     @property
     def lt(self) -> Tuple[float, float]:
-        lt2 = self.lt2
-        lt_mean = np.sqrt(lt2.mean())
-        Dlt2 = lt2.std(ddof=1)/np.sqrt(len(lt2))
-        Dlt = Dlt2 / 2 / lt_mean
-        return lt_mean, Dlt
+        return self.get_root_mean("lt2")
 
     @property
     def st(self) -> Tuple[float, float]:
-        st2 = self.st2
-        st_mean = np.sqrt(st2.mean())
-        Dst2 = st2.std(ddof=1)/np.sqrt(len(st2))
-        Dst = Dst2 / 2 / st_mean
-        return st_mean, Dst
+        return self.get_root_mean("st2")
 
     def print_output(self):
         bw_result = self.bw
@@ -2,6 +2,12 @@ import numpy as np
 from typing import Sequence
 
 
+def mutates_input(operation):
+    """Mark an operation that modifies its `output` argument in place, it then gets a copy"""
+    operation.mutates_input = True
+    return operation
+
+
 class Measure:
     def __init__(
         self,
@@ -9,27 +15,40 @@ class Measure:
         measure_type: str,
         *operations,
         name: str = "",
+        item=None,
         max_size: int = None,
         time: Sequence[float] = None,
         save_path: str = None,
-        save_name: str = None
+        save_name: str = None,
+        streaming: bool = False
     ):
         self.channel = channel
         self.measure_type: str = measure_type
         self.operations: tuple = tuple(operations)
-        self.name = name or (operations[0].__name__ if len(
+        # Measures with the same operations share one evaluation, each keeps its item of the result
+        self.item = item
+        self.name = name or (item if isinstance(item, str) else "") or (operations[0].__name__ if len(
             operations) == 1 and operations[0].__name__ != "<lambda>" else "")
         self.max_size = max_size
         self.time: tuple = tuple(time) if time else None
         self.data: list = []
         self.iteration_data = None
+        # Streaming measures only count samples, their results keep running statistics
+        self.streaming = streaming
+        self.count = 0
 
     @property
     def is_done(self):
         return self.max_size is not None and len(self) >= self.max_size
 
+    def append(self, value):
+        if self.streaming:
+            self.count += 1
+        else:
+            self.data.append(value)
+
     def __len__(self):
-        return len(self.data)
+        return self.count if self.streaming else len(self.data)
 
     def __array__(self):
         return np.asarray(self.data)
@@ -37,6 +56,95 @@ class Measure:
     def __repr__(self):
         return self.name
 
+
+class RunningMoments:
+    """Mergeable count, mean and variance of samples of a fixed shape"""
+
+    def __init__(self):
+        self.count = 0
+        self.mean = 0.
+        self.m2 = 0.
+
+    def append(self, value):
+        value = np.asarray(value, dtype=float)
+        self.count += 1
+        delta = value - self.mean
+        self.mean = self.mean + delta / self.count
+        self.m2 = self.m2 + delta * (value - self.mean)
+
+    def merge(self, other):
+        """Pairwise update of Chan et al."""
+        if not other.count:
+            return
+        count = self.count + other.count
+        delta = other.mean - self.mean
+        self.mean = self.mean + delta * other.count / count
+        self.m2 = self.m2 + other.m2 + delta**2 * self.count * other.count / count
+        self.count = count
+
+    def variance(self, ddof=1):
+        return self.m2 / (self.count - ddof)
+
+    def std(self, ddof=1):
+        return np.sqrt(self.variance(ddof))
+
+
+class RunningCovariance:
+    """Mergeable moments and covariance of (x, y) samples"""
+
+    def __init__(self):
+        self.x = RunningMoments()
+        self.y = RunningMoments()
+        self.c = 0.
+
+    @property
+    def count(self):
+        return self.x.count
+
+    def append(self, value):
+        x, y = (np.asarray(v, dtype=float) for v in value)
+        dx = x - self.x.mean
+        self.x.append(x)
+        self.y.append(y)
+        self.c = self.c + dx * (y - self.y.mean)
+
+    def merge(self, other):
+        if not other.count:
+            return
+        count = self.count + other.count
+        dx = other.x.mean - self.x.mean
+        dy = other.y.mean - self.y.mean
+        self.c = self.c + other.c + dx * dy * self.count * other.count / count
+        self.x.merge(other.x)
+        self.y.merge(other.y)
+
+    def covariance(self, ddof=1):
+        return self.c / (self.count - ddof)
+
+    def correlation(self):
+        return self.c / np.sqrt(self.x.m2 * self.y.m2)
+
+    def mean_product(self):
+        """Mean of x * y"""
+        return self.covariance(ddof=0) + self.x.mean * self.y.mean
+
+
+class RunningHistogram:
+    """Mergeable fixed-bin histogram, values out of the range are dropped"""
+
+    def __init__(self, bins: int = 100, range: tuple = (0, 1)):
+        self.edges = np.linspace(*range, bins + 1)
+        self.counts = np.zeros(bins, dtype=np.int64)
+        self.count = 0
+
+    def append(self, value):
+        self.counts += np.histogram(value, bins=self.edges)[0]
+        self.count += 1
+
+    def merge(self, other):
+        self.counts += other.counts
+        self.count += other.count
+
 #   def __eq__(self, other):
 #     is_channels_equal = self.channel == other.channel
 #     is_measure_types_equal = self.measure_type == other.measure_type
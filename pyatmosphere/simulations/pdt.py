@@ -1,34 +1,52 @@
 import numpy as np
 from matplotlib import pyplot as plt
-from functools import partial, lru_cache
+from functools import lru_cache
 
-from pyatmosphere.measures import eta, mean_x, mean_y
+from pyatmosphere.gpu import get_array
+from pyatmosphere.measures import beam_moments
+from pyatmosphere.pupils import MultiCirclePupil
 
-from pyatmosphere.simulations.measure import Measure
+from pyatmosphere.simulations.measure import Measure, RunningHistogram
 from pyatmosphere.simulations.result import Result
 
 
 class PDTResult(Result):
-    def __init__(self, channel, pupils: list = None, **kwargs):
+    def __init__(self, channel, pupils: list = None, subpixels: int = 1, **kwargs):
+        """All pupils are measured at once by a MultiCirclePupil, `subpixels` anti-aliases its masks"""
         self.pupil_shift = (0, 0)
         self.pupils = pupils or [channel.pupil]
+        self.receiver = MultiCirclePupil([pupil.radius for pupil in self.pupils], subpixels)
         measures = kwargs.pop("measures", [
-            Measure(channel, "atmosphere", partial(
-                self.append_pupil, pupil), eta, name=f"{pupil.radius}")
-            for pupil in self.pupils])
+            Measure(channel, "atmosphere", self.get_etas, item=i, name=f"{pupil.radius}")
+            for i, pupil in enumerate(self.pupils)])
         super().__init__(channel, measures, **kwargs)
 
-    def append_pupil(self, pupil, channel, output):
-        init_pupil = channel.pupil
-        channel.pupil = pupil
-        output = channel.pupil.output(output, shift=self.pupil_shift)
-        channel.pupil = init_pupil
-        return output
+    @property
+    def pdt_measures(self):
+        return self.measures[-len(self.pupils):]
+
+    def init_statistics(self):
+        bins = 200 if len(self.pupils) == 1 else 100
+        return {measures.name: RunningHistogram(bins, range=(0, 1)) for measures in self.pdt_measures}
+
+    def get_statistics_samples(self):
+        return {measures.name: measures.iteration_data for measures in self.pdt_measures}
+
+    def hist(self, ax, measures, bins, **kwargs):
+        if self.statistics is not None:
+            histogram = self.statistics[measures.name]
+            return ax.hist(histogram.edges[:-1], bins=histogram.edges, weights=histogram.counts, **kwargs)
+        return ax.hist(measures.data, bins=bins, range=(0, 1), **kwargs)
+
+    def get_etas(self, channel, output):
+        """Return eta for every pupil, a number for a single field or an array for a batch of fields"""
+        etas = get_array(self.receiver.eta(channel, output, shift=self.pupil_shift))
+        return etas.tolist() if etas.ndim == 1 else list(np.moveaxis(etas, -1, 0))
 
     def plot_output(self):
         if len(self.pupils) == 1:
-            plt.hist(
-                self.measures[0].data, label=f"Count: {len(self.measures[0])}", bins=200, range=(0, 1))
+            self.hist(plt, self.pdt_measures[0],
+                      label=f"Count: {len(self.pdt_measures[0])}", bins=200)
             plt.legend()
             plt.show()
         else:
@@ -38,11 +56,11 @@ class PDTResult(Result):
             for i, ax in enumerate(axes.flat):
                 if i >= len(self.pupils):
                     break
-                ax.hist(
-                    self.measures[i].data,
-                    label=f"Pupil radius: {self.pupils[i].radius:.3f}\nCount: {len(self.measures[0])}",
-                    bins=100,
-                    range=(0, 1)
+                self.hist(
+                    ax,
+                    self.pdt_measures[i],
+                    label=f"Pupil radius: {self.pupils[i].radius:.3f}\nCount: {len(self.pdt_measures[0])}",
+                    bins=100
                 )
                 ax.legend()
             plt.show()
@@ -51,12 +69,12 @@ class PDTResult(Result):
 class TrackedPDTResult(PDTResult):
     def __init__(self, channel, pupils: list = None, **kwargs):
         pupils = pupils or [channel.pupil]
-        beam_measures = [Measure(channel, "atmosphere", mean_x), Measure(
-            channel, "atmosphere", mean_y)]
+        beam_measures = [Measure(channel, "atmosphere", beam_moments, item="mean_x"), Measure(
+            channel, "atmosphere", beam_moments, item="mean_y")]
         pdt_measures = [
-            Measure(channel, "atmosphere", self.set_pupil_position, partial(
-                self.append_pupil, pupil), eta, name=f"{pupil.radius}")
-            for pupil in pupils]
+            Measure(channel, "atmosphere", self.set_pupil_position, self.get_etas,
+                    item=i, name=f"{pupil.radius}")
+            for i, pupil in enumerate(pupils)]
         super().__init__(channel, pupils=pupils,
                          measures=beam_measures + pdt_measures, **kwargs)
 
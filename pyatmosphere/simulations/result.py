@@ -1,16 +1,29 @@
 import numpy as np
 import pandas as pd
 
+from pyatmosphere.simulations.storage import SegmentStore, SegmentedList
+
 
 class Result:
     save_float_format = '{:.3e}'.format
 
-    def __init__(self, channel, measures, max_size=None, save_path: str = ""):
+    def __init__(self, channel, measures, max_size=None, save_path: str = "", streaming: bool = False,
+                 save_format: str = "csv"):
+        """save_format "npy" keeps the samples in append-only files of a directory at save_path"""
         self.channel = channel
         self.measures = measures
         self.set_max_size(max_size)
+        # Streaming results keep constant-size statistics instead of the samples
+        self.streaming = streaming
+        for measures in self.measures:
+            measures.streaming = streaming
+        self.statistics = self.init_statistics() if streaming else None
+        self.save_format = save_format
+        if save_format == "npy":
+            for measures in self.measures:
+                measures.data = SegmentedList()
         self.save_path = save_path
-        if self.save_path:
+        if self.save_path and not self.streaming:
             try:
                 self.load_output()
                 print(f"Loaded measures from {self.save_path}")
@@ -21,6 +34,26 @@ class Result:
         for measures in self.measures:
             measures.max_size = max_size
 
+    def init_statistics(self) -> dict:
+        """Accumulators of the streaming mode by name"""
+        return {}
+
+    def get_statistics_samples(self) -> dict:
+        """Samples of the accumulators from the iteration data of the measures"""
+        return {}
+
+    def update_statistics(self):
+        if self.statistics is None:
+            return
+        for name, value in self.get_statistics_samples().items():
+            self.statistics[name].append(value)
+
+    def merge_statistics(self, statistics):
+        if self.statistics is None:
+            return
+        for name, accumulator in statistics.items():
+            self.statistics[name].merge(accumulator)
+
     def print_output(self):
         print(f"Len of the first measures: {len(self.measures[0])}")
 
@@ -33,12 +66,19 @@ class Result:
         return df
 
     def save_output(self):
-        if not self.save_path:
+        # Streaming measures keep no samples to save
+        if not self.save_path or self.streaming:
+            return
+        if self.save_format == "npy":
+            SegmentStore(self.save_path).save(self.measures)
             return
         self.as_df().to_csv(self.save_path, index=False,
                             float_format=self.save_float_format)
 
     def load_output(self):
+        if self.save_format == "npy":
+            SegmentStore(self.save_path).load(self.measures)
+            return
         for measures, data in zip(self.measures, pd.read_csv(self.save_path).T.values):
             measures.data = data.tolist()
 
@@ -4,7 +4,7 @@ from matplotlib import pyplot as plt
 from pyatmosphere.theory.atmosphere.si import get_SI_andrews_strong
 from pyatmosphere.gpu import get_array
 
-from pyatmosphere.simulations.measure import Measure
+from pyatmosphere.simulations.measure import Measure, RunningMoments
 from pyatmosphere.simulations.result import Result
 
 
@@ -23,6 +23,12 @@ class SIResult(Result):
         self.theoretical_si = [theoretical_function(
             self.positions, self.channel.path.phase_screen.model, self.channel.source) for theoretical_function in theoretical_functions]
 
+    def init_statistics(self):
+        return {"intensities_at_center": RunningMoments()}
+
+    def get_statistics_samples(self):
+        return {"intensities_at_center": self.measures[0].iteration_data}
+
     @property
     def intensities_at_center(self):
         return np.asarray(self.measures[0])
@@ -33,6 +39,9 @@ class SIResult(Result):
 
     @property
     def si(self):
+        if self.statistics is not None:
+            moments = self.statistics["intensities_at_center"]
+            return moments.variance(ddof=0) / moments.mean**2
         return (self.intensities_at_center**2).mean(axis=0) / self.intensities_at_center.mean(axis=0)**2 - 1
 
     def plot_output(self):
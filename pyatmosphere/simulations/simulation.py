@@ -1,12 +1,62 @@
+import multiprocessing
+import os
+import pickle
+import queue
+import signal
 from typing import Sequence
 
+import numpy as np
+
 from pyatmosphere.simulations.result import Result
 from pyatmosphere.simulations.measure import Measure
+from pyatmosphere.simulations.storage import replace_atomically
+from pyatmosphere.utils import to_centered_order
+
+
+_worker_simulation = None
+
+
+def _read_only(output):
+    """Field view shared by the operations, writes to it fail on numpy"""
+    if isinstance(output, np.ndarray):
+        output = output.view()
+        output.flags.writeable = False
+    return output
+
+
+def _init_worker(simulation):
+    global _worker_simulation
+    # The parent process handles KeyboardInterrupt and terminates the pool
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    _worker_simulation = simulation
+
+
+def _run_iterations(seed_sequence, iterations, done):
+    channels = list(_worker_simulation.measures)
+    for channel, channel_seed_sequence in zip(channels, seed_sequence.spawn(len(channels))):
+        channel.seed(channel_seed_sequence)
+    measures_list = list(_worker_simulation.flattened_measures())
+    for measures, is_done in zip(measures_list, done):
+        measures.data = []
+        measures.count = 0
+        measures.max_size = 0 if is_done else None
+    results_list = _worker_simulation.results_list or []
+    for result in results_list:
+        if result.statistics is not None:
+            result.statistics = result.init_statistics()
+    for _ in range(iterations):
+        _worker_simulation.iter()
+    return iterations, [measures.data for measures in measures_list], [result.statistics for result in results_list]
 
 
 class Simulation:
-    def __init__(self, results_list: Sequence[Result] = None, measures_list: Sequence[Measure] = None):
+    def __init__(self, results_list: Sequence[Result] = None, measures_list: Sequence[Measure] = None,
+                 checkpoint_path: str = None):
+        """With `checkpoint_path` the whole simulation state is saved there at every `save_step`
+        and restored by a new simulation with the same measures"""
         self.measures = {}
+        self.iteration = 0
+        self.seed_sequence = None
         if measures_list:
             for measures in measures_list:
                 self.add_measures(measures)
@@ -15,6 +65,47 @@ class Simulation:
             for result in results_list:
                 for measures in result.measures:
                     self.add_measures(measures)
+        self.checkpoint_path = checkpoint_path
+        if checkpoint_path and os.path.exists(checkpoint_path):
+            self.load_checkpoint()
+            print(f"Loaded checkpoint of iteration {self.iteration} from {checkpoint_path}")
+
+    def get_state(self) -> dict:
+        return {
+            "iteration": self.iteration,
+            "measures": [(measures.data, measures.count, measures.iteration_data)
+                         for measures in self.flattened_measures()],
+            "statistics": [result.statistics for result in self.results_list or []],
+            "random_state": np.random.get_state(),
+            "seed_sequence": self.seed_sequence,
+            "phase_screens": [[ps.get_state() for ps in getattr(channel.path, "phase_screens", [])]
+                              for channel in self.measures],
+        }
+
+    def set_state(self, state: dict):
+        self.iteration = state["iteration"]
+        for measures, (data, count, iteration_data) in zip(self.flattened_measures(), state["measures"]):
+            measures.data, measures.count, measures.iteration_data = data, count, iteration_data
+        for result, statistics in zip(self.results_list or [], state["statistics"]):
+            result.statistics = statistics
+        np.random.set_state(state["random_state"])
+        self.seed_sequence = state["seed_sequence"]
+        for channel, phase_screens_state in zip(self.measures, state["phase_screens"]):
+            for ps, ps_state in zip(getattr(channel.path, "phase_screens", []), phase_screens_state):
+                ps.set_state(ps_state)
+
+    def save_checkpoint(self):
+        if not self.checkpoint_path:
+            return
+
+        def write_checkpoint(path):
+            with open(path, "wb") as f:
+                pickle.dump(self.get_state(), f)
+        replace_atomically(self.checkpoint_path, write_checkpoint)
+
+    def load_checkpoint(self):
+        with open(self.checkpoint_path, "rb") as f:
+            self.set_state(pickle.load(f))
 
     def add_measures(self, measures):
         """channel - time - measure_type - operations"""
@@ -61,30 +152,41 @@ class Simulation:
 #               empty_data = [None for _ in range(len(channel.path.positions) + 1)]
 #             self.iter_data[channel][time][measures_type][operations] = empty_data
 
-    def process_operations(self, output, operations_measures, time_id, propagation_id=None):
+    def process_operations(self, output, operations_measures, time_id, propagation_id=None, outputs=None):
+        """Evaluate every operations chain once, chains sharing a prefix reuse its output
+
+        `outputs` maps evaluated prefixes to their outputs and can be shared by calls on the same field.
+        The field is not copied, only operations marked by `mutates_input` get a copy of their input.
+        """
+        outputs = {} if outputs is None else outputs
+        outputs.setdefault((), _read_only(output))
         for operations, measures_list in operations_measures.items():
             if self.is_measures_done(measures_list):
                 continue
             measures = measures_list[0]
-            measures_output = output.copy()
-            for operation in operations:
-                measures_output = operation(
-                    measures.channel, output=measures_output)
+            evaluated = max(i for i in range(len(operations) + 1) if operations[:i] in outputs)
+            measures_output = outputs[operations[:evaluated]]
+            for i in range(evaluated, len(operations)):
+                if getattr(operations[i], "mutates_input", False):
+                    measures_output = measures_output.copy()
+                measures_output = operations[i](measures.channel, output=measures_output)
+                outputs[operations[:i + 1]] = measures_output
 
             for measures in measures_list:
                 if measures.is_done:
                     continue
 
+                value = measures_output if measures.item is None else measures_output[measures.item]
                 if not measures.time is None:
                     if not propagation_id is None:
-                        measures.iteration_data[time_id][propagation_id] = measures_output
+                        measures.iteration_data[time_id][propagation_id] = value
                     else:
-                        measures.iteration_data[time_id] = measures_output
+                        measures.iteration_data[time_id] = value
                 else:
                     if not propagation_id is None:
-                        measures.iteration_data[propagation_id] = measures_output
+                        measures.iteration_data[propagation_id] = value
                     else:
-                        measures.iteration_data = measures_output
+                        measures.iteration_data = value
 
     def iter(self):
         self.init_measures_iteration_data()
@@ -94,22 +196,31 @@ class Simulation:
             for time, time_measures in channel_measures.items():
                 time = time or [None]
                 for time_id, time_value in enumerate(time):
-                    for propagation_id, (propagation_result, phase_screen) in enumerate(channel.generator(pupil=False, shift=(0, time_value or 0), store_output=True, wind=True)):
-                        self.process_operations(propagation_result, time_measures.get(
-                            "propagation", {}), time_id, propagation_id)
-                        if propagation_id == 0:
+                    propagation_measures = time_measures.get("propagation", {})
+                    phase_screen_measures = time_measures.get("phase_screen", {})
+                    # Steps are propagated in native FFT order and centered only for the measures reading them
+                    for propagation_id, (propagation_result, phase_screen) in enumerate(channel.generator(pupil=False, shift=(0, time_value or 0), store_output=True, wind=True, native=True)):
+                        if not self.is_measures_done(propagation_measures):
+                            self.process_operations(to_centered_order(propagation_result),
+                                                    propagation_measures, time_id, propagation_id)
+                        if propagation_id == 0 and not self.is_measures_done(phase_screen_measures):
                             self.process_operations(
-                                phase_screen, time_measures.get("phase_screen", {}), time_id)
+                                to_centered_order(phase_screen), phase_screen_measures, time_id)
+                    outputs = {}
                     self.process_operations(
-                        channel.output, time_measures.get("atmosphere", {}), time_id)
+                        channel.output, time_measures.get("atmosphere", {}), time_id, outputs=outputs)
                     self.process_operations(channel.output, time_measures.get(
-                        "propagation", {}), time_id, -1)
+                        "propagation", {}), time_id, -1, outputs=outputs)
                     if channel.pupil:
                         self.process_operations(channel.pupil.output(
                             channel.output), time_measures.get("pupil", {}), time_id)
+        updated_results = [result for result in self.results_list or []
+                           if not self.is_measures_done(result.measures)]
         for measures in self.flattened_measures():
             if not measures.is_done:
-                measures.data.append(measures.iteration_data)
+                measures.append(measures.iteration_data)
+        for result in updated_results:
+            result.update_statistics()
 #       if not measures.is_done:
 #         measures.data.append(self.iter_data[measures.channel][measures.time][measures.measure_type][measures.operations])
 
@@ -124,21 +235,105 @@ class Simulation:
     def is_measures_done(self, measures=None):
         return all((m.is_done for m in self.flattened_measures(measures)))
 
-    def run(self, *args, plot_step: int = None, save_step: int = None, **kwargs):
+    def run(self, *args, plot_step: int = None, save_step: int = None, processes: int = None,
+            chunk_size: int = 10, seed=None, **kwargs):
+        """Run iterations until all measures are done
+
+        With `processes` the iterations are distributed in chunks of `chunk_size`
+        over a pool of worker processes. Each chunk uses its own random stream
+        spawned from `np.random.SeedSequence(seed)`.
+        """
         try:
-            iteration = 0
-            while not self.is_measures_done():
-                self.iter()
-                iteration += 1
-                self.process_output(
-                    iteration, plot_step=plot_step, save_step=save_step)
+            if processes:
+                self.run_parallel(processes, chunk_size=chunk_size, seed=seed,
+                                  plot_step=plot_step, save_step=save_step)
+            else:
+                while not self.is_measures_done():
+                    self.iter()
+                    self.iteration += 1
+                    self.process_output(
+                        self.iteration, plot_step=plot_step, save_step=save_step)
         except KeyboardInterrupt:
             pass
         finally:
             self.process_output(0, plot_step=plot_step, save_step=save_step)
 
-    def process_output(self, iteration, plot_step, save_step):
-        if plot_step and iteration % plot_step == 0:
+    def remaining_iterations(self):
+        """Iterations needed to fill all measures or None if some measures are unlimited"""
+        remaining = 0
+        for measures in self.flattened_measures():
+            if measures.is_done:
+                continue
+            if measures.max_size is None:
+                return None
+            remaining = max(remaining, measures.max_size - len(measures))
+        return remaining
+
+    def merge_data(self, iterations, data_list, statistics_list):
+        for result, statistics in zip(self.results_list or [], statistics_list):
+            if not self.is_measures_done(result.measures):
+                result.merge_statistics(statistics)
+        for measures, data in zip(self.flattened_measures(), data_list):
+            if measures.is_done:
+                continue
+            if measures.streaming:
+                measures.count += iterations if measures.max_size is None else min(
+                    iterations, measures.max_size - measures.count)
+                continue
+            if measures.max_size is not None:
+                data = data[:measures.max_size - len(measures)]
+            measures.data.extend(data)
+
+    def run_parallel(self, processes: int, chunk_size: int = 10, seed=None, plot_step: int = None, save_step: int = None):
+        # A restored simulation continues the spawned streams of the checkpoint
+        if self.seed_sequence is None:
+            self.seed_sequence = np.random.SeedSequence(seed)
+        results = queue.Queue()
+        pool = multiprocessing.Pool(
+            processes, initializer=_init_worker, initargs=(self,))
+        try:
+            scheduled = 0
+            pending = 0
+            while True:
+                remaining = self.remaining_iterations()
+                while pending < processes and (remaining is None or remaining > scheduled):
+                    iterations = chunk_size if remaining is None else min(
+                        chunk_size, remaining - scheduled)
+                    done = [measures.is_done for measures in self.flattened_measures()]
+                    pool.apply_async(_run_iterations, (self.seed_sequence.spawn(1)[0], iterations, done),
+                                     callback=results.put, error_callback=results.put)
+                    scheduled += iterations
+                    pending += 1
+                if not pending:
+                    break
+
+                result = results.get()
+                if isinstance(result, BaseException):
+                    raise result
+                iterations, data_list, statistics_list = result
+                scheduled -= iterations
+                pending -= 1
+                self.merge_data(iterations, data_list, statistics_list)
+                self.iteration += iterations
+                self.process_output(self.iteration, plot_step=plot_step, save_step=save_step,
+                                    previous_iteration=self.iteration - iterations)
+        except BaseException:
+            pool.terminate()
+            raise
+        else:
+            pool.close()
+        finally:
+            pool.join()
+
+    def process_output(self, iteration, plot_step, save_step, previous_iteration=None):
+        """Plot and save the output if a step boundary was passed since `previous_iteration`"""
+        if previous_iteration is None:
+            previous_iteration = iteration - 1
+
+        def is_step(step):
+            return step and iteration // step > previous_iteration // step
+
+        if is_step(plot_step):
             for result in self.results_list:
                 result.plot_output()
             try:
@@ -147,6 +342,7 @@ class Simulation:
             except ModuleNotFoundError:
                 pass
 
-        if save_step and iteration % save_step == 0:
+        if is_step(save_step):
             for result in self.results_list:
                 result.save_output()
+            self.save_checkpoint()
@@ -0,0 +1,125 @@
+import json
+import os
+
+import numpy as np
+
+
+INDEX_NAME = "index.json"
+
+
+def replace_atomically(path, write):
+    tmp_path = path + ".tmp"
+    write(tmp_path)
+    os.replace(tmp_path, path)
+
+
+class SegmentedList:
+    """List-like samples kept as a saved file, memory-mapped on access, and an in-memory tail
+
+    No file is kept open, the saved samples are mapped only while they are read,
+    and pickles, such as simulation checkpoints, hold only the file path, the count and the tail.
+    """
+
+    def __init__(self, path=None, dtype=None, shape=(), count=0, tail=()):
+        self.path = path
+        self.dtype = np.dtype(dtype)
+        self.shape = tuple(shape)
+        self.count = count
+        self.tail = list(tail)
+
+    @property
+    def saved(self):
+        if not self.count:
+            return np.empty((0, *self.shape), dtype=self.dtype)
+        return np.memmap(self.path, dtype=self.dtype, mode="r", shape=(self.count, *self.shape))
+
+    def append(self, value):
+        self.tail.append(value)
+
+    def extend(self, values):
+        self.tail.extend(values)
+
+    def __len__(self):
+        return self.count + len(self.tail)
+
+    def __iter__(self):
+        yield from self.saved
+        yield from self.tail
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return list(self)[index]
+        if index < 0:
+            index += len(self)
+        if index < self.count:
+            return self.saved[index]
+        return self.tail[index - self.count]
+
+    def __array__(self, dtype=None, copy=None):
+        # Before the first save the sample shape and dtype are known only from the tail
+        if not self.count and self.tail:
+            array = np.asarray(self.tail)
+        else:
+            arrays = [np.asarray(self.saved)] + ([np.asarray(self.tail)] if self.tail else [])
+            array = np.concatenate(arrays)
+        return array if dtype is None else array.astype(dtype)
+
+
+class SegmentStore:
+    """Directory of one growing raw file of samples per measure and a JSON index of their counts
+
+    Every save appends only the samples added since the previous one.
+    The index is replaced atomically after the samples are written, so an interrupted save
+    leaves the previous checkpoint readable, samples past the indexed count are overwritten.
+    """
+
+    def __init__(self, path):
+        self.path = path
+
+    @property
+    def index_path(self):
+        return os.path.join(self.path, INDEX_NAME)
+
+    def read_index(self):
+        with open(self.index_path) as f:
+            return json.load(f)
+
+    def save(self, measures_list):
+        os.makedirs(self.path, exist_ok=True)
+        try:
+            index = self.read_index()
+        except FileNotFoundError:
+            index = {"measures": [{"name": measures.name, "file": f"{i}.bin", "count": 0}
+                                  for i, measures in enumerate(measures_list)]}
+        for measures, measures_index in zip(measures_list, index["measures"]):
+            file_path = os.path.join(self.path, measures_index["file"])
+            if not isinstance(measures.data, SegmentedList):
+                measures.data = SegmentedList(tail=measures.data)
+            data = measures.data
+            # Samples restored from a simulation checkpoint may be fewer than the indexed ones
+            if data.path == file_path:
+                measures_index["count"] = data.count
+            if not data.tail:
+                continue
+            tail = np.asarray(data.tail)
+            if not measures_index["count"]:
+                measures_index["dtype"], measures_index["shape"] = tail.dtype.str, list(tail.shape[1:])
+            tail = tail.astype(measures_index["dtype"], copy=False)
+            with open(file_path, "a+b") as f:
+                f.truncate(measures_index["count"] * tail[0].nbytes)
+                f.write(tail.tobytes())
+            measures_index["count"] += len(tail)
+            measures.data = SegmentedList(file_path, measures_index["dtype"], measures_index["shape"],
+                                          measures_index["count"])
+
+        def write_index(path):
+            with open(path, "w") as f:
+                json.dump(index, f)
+        replace_atomically(self.index_path, write_index)
+
+    def load(self, measures_list):
+        index = self.read_index()
+        for measures, measures_index in zip(measures_list, index["measures"]):
+            measures.data = SegmentedList(
+                os.path.join(self.path, measures_index["file"]), measures_index.get("dtype"),
+                measures_index.get("shape", ()), measures_index["count"])
@@ -1,21 +1,25 @@
 import numpy as np
+from functools import partial
+from typing import Sequence
 from matplotlib import pyplot as plt
 
 from pyatmosphere.theory.phase_screens.sf import calculate_sf
 from pyatmosphere.gpu import get_array, get_xp
 
-from pyatmosphere.simulations.measure import Measure
+from pyatmosphere.simulations.measure import Measure, RunningMoments
 from pyatmosphere.simulations.result import Result
 
 
-def calculate_structure_function(channel, output):
-    return get_array(calculate_sf(output).mean(axis=1))
+def calculate_structure_function(channel, output, lags=None):
+    return get_array(calculate_sf(output, lags=lags).mean(axis=1))
 
 
 class StructureFunctionResult(Result):
-    def __init__(self, channel, *args, **kwargs):
+    def __init__(self, channel, *args, lags: Sequence[int] = None, **kwargs):
+        self.lags = lags
         measures = [Measure(channel, "phase_screen",
-                             calculate_structure_function)]
+                             partial(calculate_structure_function, lags=lags),
+                             name="calculate_structure_function")]
         super().__init__(*args, channel=channel, measures=measures, **kwargs)
         self.init_theoretical()
 
@@ -27,13 +31,23 @@ class StructureFunctionResult(Result):
         self.get_numerical_theoretical = get_array(channel.path.phase_screen.model.sf_phi_numeric(
             self.r, k, channel.path.phase_screen.thickness))
 
+    def init_statistics(self):
+        return {"structure_function": RunningMoments()}
+
+    def get_statistics_samples(self):
+        return {"structure_function": self.measures[0].iteration_data}
+
     @property
     def structure_function(self):
+        if self.statistics is not None:
+            return self.statistics["structure_function"].mean
         xp = get_xp()
         return get_array(xp.asarray(self.measures[0]).mean(axis=0))
 
     @property
     def r(self):
+        if self.lags is not None:
+            return np.asarray(self.lags) * self.channel.grid.delta
         return np.arange(1, self.channel.grid.resolution[0]) * self.channel.grid.delta
 
     def plot_output(self):
@@ -3,15 +3,17 @@ import pandas as pd
 from typing import Sequence
 from matplotlib import pyplot as plt
 
-from pyatmosphere.measures import eta, mean_x, mean_y
+from pyatmosphere.measures import eta, beam_moments
 from scipy.stats import pearsonr
 
-from pyatmosphere.simulations.measure import Measure
+from pyatmosphere.simulations.measure import Measure, RunningCovariance
 from pyatmosphere.simulations.result import Result
 
 
 class WindResult(Result):
     def load_output(self):
+        if self.save_format == "npy":
+            return super().load_output()
         for measures, data in zip(self.measures, pd.read_csv(self.save_path).T.values):
             measures.data = [
                 [float(i) for i in row[1:-1].split(", ")] for row in data]
@@ -22,8 +24,17 @@ class TimeCoherenceResult(WindResult):
         measures = [Measure(channel, "pupil", eta, time=time)]
         super().__init__(*args, channel=channel, measures=measures, **kwargs)
 
+    def init_statistics(self):
+        return {"eta": RunningCovariance()}
+
+    def get_statistics_samples(self):
+        eta = np.asarray(self.measures[0].iteration_data)
+        return {"eta": (eta[0], eta)}
+
     @property
     def tc(self) -> Sequence[float]:
+        if self.statistics is not None:
+            return self.statistics["eta"].correlation()
         return [pearsonr(np.asarray(self.measures[0])[:, 0], np.asarray(self.measures[0])[:, i])[0] for i in range(len(self.measures[0].time))]
 
     def plot_output(self):
@@ -31,25 +42,39 @@ class TimeCoherenceResult(WindResult):
             plt.plot(self.measures[0].time, self.tc)
             plt.ylim((0, 1))
         plt.show()
-        print(f"Iteration: {len(self.measures[0].data)}")
+        print(f"Iteration: {len(self.measures[0])}")
 
 
 class TimeBWcorrSimulation(WindResult):
     def __init__(self, channel, time, *args, **kwargs):
-        measures = [Measure(channel, "atmosphere", mean_x, time=time), Measure(
-            channel, "atmosphere", mean_y, time=time)]
+        measures = [Measure(channel, "atmosphere", beam_moments, item="mean_x", time=time), Measure(
+            channel, "atmosphere", beam_moments, item="mean_y", time=time)]
         super().__init__(*args, channel=channel, measures=measures, **kwargs)
 
+    def init_statistics(self):
+        return {"xx": RunningCovariance(), "yy": RunningCovariance(), "xy": RunningCovariance()}
+
+    def get_statistics_samples(self):
+        x = np.asarray(self.measures[0].iteration_data)
+        y = np.asarray(self.measures[1].iteration_data)
+        return {"xx": (x[0], x), "yy": (y[0], y), "xy": (x[0], y)}
+
     @property
     def xx(self) -> Sequence[float]:
+        if self.statistics is not None:
+            return 2 * np.sqrt(self.statistics["xx"].mean_product())
         return 2 * np.sqrt((np.asarray(self.measures[0])[:, 0, None] * np.asarray(self.measures[0])[:, :]).mean(axis=0))
 
     @property
     def yy(self) -> Sequence[float]:
+        if self.statistics is not None:
+            return 2 * np.sqrt(self.statistics["yy"].mean_product())
         return 2 * np.sqrt((np.asarray(self.measures[1])[:, 0, None] * np.asarray(self.measures[1])[:, :]).mean(axis=0))
 
     @property
     def xy(self) -> Sequence[float]:
+        if self.statistics is not None:
+            return 2 * np.sqrt(abs(self.statistics["xy"].mean_product()))
         return 2 * np.sqrt(abs((np.asarray(self.measures[0])[:, 0, None] * np.asarray(self.measures[1])[:, :]).mean(axis=0)))
 
     def plot_output(self):
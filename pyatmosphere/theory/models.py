@@ -4,7 +4,7 @@ import scipy.special
 from dataclasses import dataclass
 
 from pyatmosphere.theory.atmosphere import get_r0
-from pyatmosphere.gpu import get_xp
+from pyatmosphere.gpu import get_xp, get_array
 
 
 @dataclass
@@ -31,6 +31,26 @@ class Model:
         phi_coeff = 2 * xp.pi * k**2 * thickness
         return xp.array([phi_coeff * (2 * xp.pi) * 2 * scipy.integrate.quad(dsf, 0, np.inf, args=(ri,), epsrel=1e-3,)[0] * (2*xp.pi) for ri in r])
 
+    def covariance_phi_numeric(self, r, k, thickness, points=2**14, chunk_size=256):
+        """Phase covariance (2 pi)**2 int psd_phi_f(f) J0(2 pi f r) 2 pi f df of numpy distances r
+
+        The trapezoidal rule runs over log-spaced frequencies between 1e-3 / L0 and 24 / l0 / (2 pi).
+        """
+        log_f = np.linspace(np.log(1e-3 / self.L0), np.log(24 / self.l0 / (2 * np.pi)), points)
+        f = np.exp(log_f)
+        weights = np.full(points, log_f[1] - log_f[0])
+        weights[[0, -1]] /= 2
+        xp = get_xp()
+        psd = get_array(self.psd_phi_f(xp.asarray(f), k, thickness))
+        # df = f dlog_f, (2 pi)**2 converts the spectral density from kappa to f
+        weighted_psd = (2 * np.pi)**3 * psd * f**2 * weights
+        r = np.asarray(r, dtype=np.float64)
+        flat_r = r.ravel()
+        covariance = np.concatenate([
+            scipy.special.j0(2 * np.pi * flat_r[i:i + chunk_size, None] * f) @ weighted_psd
+            for i in range(0, max(len(flat_r), 1), chunk_size)])
+        return covariance.reshape(r.shape)
+
 
 # class KModel(Model):
 #     def psd_n(self, kappa):
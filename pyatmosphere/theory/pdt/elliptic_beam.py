@@ -1,14 +1,17 @@
 from typing import Optional, Tuple
 
 import numpy as np
-from scipy.special import lambertw, iv
+from scipy.special import lambertw, i0e, i1e
 
 
 class EllipticBeamAnalyticalPDT:
-    def __init__(self, W0, a, size: int):
+    """Elliptic-beam model of the PDT, all methods work on arrays of beam parameters"""
+
+    def __init__(self, W0, a, size: int, chunk_size: int = 2**16):
         self.W0 = W0
         self.a = a
         self.size = size
+        self.chunk_size = chunk_size
         self.bw: Optional[float] = None
         self.theta_mean: Optional[float] = None
         self.theta_cov: Optional[Tuple[float, float]] = None
@@ -52,29 +55,34 @@ class EllipticBeamAnalyticalPDT:
         W2_eff = 4 * self.a**2 / lambertw(arg).real
         return np.sqrt(W2_eff)
 
-    def _get_R_lambda(self, xi) -> Tuple[float, float]:
-        if xi == 0:
-            return np.inf, 2
-        arg = self.a**2 * xi**2
-        exp_bes_part = 1 - np.exp(-arg) * iv(0, arg)
-        log_part = np.log(2 * (1 - np.exp(-arg / 2)) / exp_bes_part)
+    def _get_R_lambda(self, xi) -> Tuple[np.ndarray, np.ndarray]:
+        arg = self.a**2 * np.asarray(xi, dtype=float)**2
+        # The closed form cancels for small arguments, where log_part = x/2 - x**2/8 + x**3/96 + O(x**4)
+        # and lambda = 2 + O(x**3), xi = 0 is the limit R = inf, lambda = 2
+        small = arg < 1e-3
+        closed_arg = np.where(small, 1, arg)
+        exp_bes_part = 1 - i0e(closed_arg)
+        log_part = np.log(2 * (1 - np.exp(-closed_arg / 2)) / exp_bes_part)
 
-        lmbd_part_1 = np.exp(-arg) * iv(1, arg)
-        lmbd = 2 * arg * lmbd_part_1 / exp_bes_part / log_part
-        R = log_part**(-1 / lmbd)
-        return R, lmbd
+        lmbd_part_1 = i1e(closed_arg)
+        lmbd = 2 * closed_arg * lmbd_part_1 / exp_bes_part / log_part
+        log_part = np.where(small, arg / 2 - arg**2 / 8 + arg**3 / 96, log_part)
+        lmbd = np.where(small, 2, lmbd)
+        degenerate = arg == 0
+        R = np.where(degenerate, 1, log_part)**(-1 / lmbd)
+        return np.where(degenerate, np.inf, R), lmbd
 
     def _get_eta0(self, W1, W2):
         R, lmbd = self._get_R_lambda(1 / W1 - 1 / W2)
-        eta0_part1 = iv(0, self.a**2 * (1 / W1**2 - 1 / W2**2))
-        eta0_part2 = np.exp(-self.a**2 * (1 / W1**2 + 1 / W2**2))
-        if W1 == W2:
-            eta0_part3 = 0
-            eta0_part4 = 0
-        else:
-            eta0_part3 = 2 * (1 - np.exp(-self.a**2 / 2 * (1 / W1 - 1 / W2)**2))
-            eta0_part4 = np.exp(-((W1 + W2)**2 / np.abs(W1**2 - W2**2) / R)**lmbd)
-        return 1 - eta0_part1 * eta0_part2 - eta0_part3 * eta0_part4
+        # iv(0, x) * exp(-y) = i0e(x) * exp(|x| - y) does not overflow for narrow beams
+        bes_arg = self.a**2 * np.abs(1 / W1**2 - 1 / W2**2)
+        eta0_part12 = i0e(bes_arg) * np.exp(bes_arg - self.a**2 * (1 / W1**2 + 1 / W2**2))
+        W2_difference = np.abs(W1**2 - W2**2)
+        equal = W2_difference == 0
+        eta0_part3 = 2 * (1 - np.exp(-self.a**2 / 2 * (1 / W1 - 1 / W2)**2))
+        eta0_part4 = np.exp(-((W1 + W2)**2 / np.where(equal, 1, W2_difference) /
+                              np.where(equal, 1, R))**np.where(equal, 2, lmbd))
+        return 1 - eta0_part12 - np.where(equal, 0, eta0_part3 * eta0_part4)
 
     def eta(self, r_0, varphi_0, theta_1, theta_2, phi):
         W1 = self.W0 * np.exp(theta_1 / 2)
@@ -96,8 +104,8 @@ class EllipticBeamAnalyticalPDT:
             [self.theta_cov, self.theta_cov[::-1]],
             size=self.size).T
         phis = np.random.uniform(0, np.pi / 2, size=self.size)
-        params = zip(r_0s, varphi_0s, thetas[0], thetas[1], phis)
-        transmittance = []
-        for r_0, varphi_0, theta_1, theta_2, phi in params:
-            transmittance.append(self.eta(r_0, varphi_0, theta_1, theta_2, phi))
+        transmittance = np.empty(self.size)
+        for start in range(0, self.size, self.chunk_size):
+            part = slice(start, start + self.chunk_size)
+            transmittance[part] = self.eta(r_0s[part], varphi_0s[part], thetas[0, part], thetas[1, part], phis[part])
         return transmittance
@@ -2,13 +2,12 @@ import numpy as np
 import warnings
 
 from scipy.stats import lognorm, beta
-from scipy.special import i1
+from scipy.special import i1, i0e
 from scipy.integrate import quad
 
-from pyatmosphere.measures import eta as eta_measure
-from pyatmosphere.pupils import CirclePupil
+from pyatmosphere.pupils import MultiCirclePupil
 from pyatmosphere.grids import RectGrid
-from pyatmosphere.gpu import get_xp
+from pyatmosphere.gpu import get_xp, get_array
 
 
 def bw_eta_0(a, st2):
@@ -113,35 +112,57 @@ def beta_bayesian_pdt(eta, eta_mean, eta2_mean, a, st2, bw2, scale_R=None, shape
     return 1 / r0_size * beta_bayesian_model
 
 
-def elliptic_beam_numerical_transmission(beam_params: dict, pupil_radiuses, resolution=2**8, is_tracked=False):
-    mean_x, mean_y = beam_params["mean_x"], beam_params["mean_y"]
-    mean_x2, mean_y2, mean_xy = beam_params["mean_x2"], beam_params["mean_y2"], beam_params["mean_xy"]
-
-    lt_mean = np.sqrt(4 * (np.asarray(mean_x2) + np.asarray(mean_y2)).mean())
-
-    class DummyChannel:
-        grid = RectGrid(resolution=resolution, delta=8 * lt_mean / resolution)
-
-    pupils = []
-    for pupil_radius in pupil_radiuses:
-        pupil = CirclePupil(radius=pupil_radius)
-        pupil.channel = DummyChannel
-        pupils.append(pupil)
-
-    model_eta = [[] for _ in pupils]
-    for mean_x, mean_y, mean_x2, mean_y2, mean_xy in zip(mean_x, mean_y, mean_x2, mean_y2, mean_xy):
-        Sxx = 4 * (mean_x2 - mean_x**2)
-        Syy = 4 * (mean_y2 - mean_y**2)
-        Sxy = 4 * (mean_xy - mean_x * mean_y)
-        detS = Sxx * Syy - Sxy**2
-        xmx0 = DummyChannel.grid.get_x()[0] - mean_x
-        ymy0 = -1 * DummyChannel.grid.get_y().T[0] - mean_y
+def elliptic_beam_numerical_transmission(beam_params: dict, pupil_radiuses, resolution=2**8, is_tracked=False,
+                                         method="grid", chunk_size=128, nodes=64):
+    """Return arrays of transmittances of the elliptic Gaussian beams of the measured moments for every pupil
+
+    method "grid" integrates the intensities on a resolution x resolution grid of 8 mean long-term widths.
+    method "quadrature" is available for tracked pupils, centered on the beams, and needs no grid:
+    eta(a) = 2 / sqrt(det S) int_0^{a**2} exp(-s u) I0(d u) du, where s and d are the sum and difference
+    of the eigenvalues of S**-1, by Gauss-Legendre nodes. Samples are evaluated in chunks of chunk_size.
+    """
+    mean_x, mean_y, mean_x2, mean_y2, mean_xy = (np.asarray(beam_params[key], dtype=float) for key in (
+        "mean_x", "mean_y", "mean_x2", "mean_y2", "mean_xy"))
+    Sxx = 4 * (mean_x2 - mean_x**2)
+    Syy = 4 * (mean_y2 - mean_y**2)
+    Sxy = 4 * (mean_xy - mean_x * mean_y)
+    detS = Sxx * Syy - Sxy**2
+    if is_tracked:
+        # Pupils centered on the beams transmit as much as centered pupils of centered beams
+        mean_x, mean_y = np.zeros_like(mean_x), np.zeros_like(mean_y)
+
+    if method == "grid":
         xp = get_xp()
-        X, Y = xp.meshgrid(xmx0, ymy0)
-        intensity = np.sqrt(2 / np.pi / np.sqrt(detS)) * \
-            xp.exp(-(Syy * X**2 - 2 * Sxy * X * Y + Sxx * Y**2) / detS)
-        for i, pupil in enumerate(pupils):
-            shift = (0, 0) if not is_tracked else (mean_x, mean_y)
-            model_eta[i].append(eta_measure(
-                DummyChannel, output=intensity * pupil.get_pupil(shift=shift)))
-    return model_eta
+        lt_mean = np.sqrt(4 * (mean_x2 + mean_y2).mean())
+        grid = RectGrid(resolution=resolution, delta=8 * lt_mean / resolution)
+        # Coordinates of the pixels inside the largest pupil and their masks for every pupil
+        index, weights = MultiCirclePupil(pupil_radiuses).get_weights(grid)
+        x, y = xp.broadcast_arrays(*grid.get_xy())
+        x, y = x.ravel()[index].astype(np.float64), -y.ravel()[index].astype(np.float64)
+        weights = weights.astype(np.float64)
+    elif method == "quadrature":
+        if not is_tracked:
+            raise ValueError("The quadrature method is available only for tracked pupils")
+        t, w = np.polynomial.legendre.leggauss(nodes)
+        radii2 = np.asarray(pupil_radiuses, dtype=float)**2
+        s = (Sxx + Syy) / detS
+        d = np.sqrt((Sxx - Syy)**2 + 4 * Sxy**2) / detS
+        # exp(-s u) I0(d u) <= exp(-(s - d) u) is negligible beyond u = 40 / (s - d)
+        u_max = np.minimum(radii2, 40 / (s - d)[:, None])
+    else:
+        raise ValueError("Available values for method: 'grid' and 'quadrature'")
+
+    model_eta = []
+    for start in range(0, len(detS), chunk_size):
+        part = slice(start, start + chunk_size)
+        if method == "grid":
+            X = x - xp.asarray(mean_x[part])[:, None]
+            Y = y - xp.asarray(mean_y[part])[:, None]
+            sxx, syy, sxy, det = (xp.asarray(v[part])[:, None] for v in (Sxx, Syy, Sxy, detS))
+            intensity = 2 / np.pi / xp.sqrt(det) * xp.exp(-2 * (syy * X**2 - 2 * sxy * X * Y + sxx * Y**2) / det)
+            model_eta.append(get_array(intensity @ weights))
+        else:
+            u = u_max[part, :, None] * (t + 1) / 2
+            integrand = i0e(d[part, None, None] * u) * np.exp(-(s - d)[part, None, None] * u)
+            model_eta.append(2 / np.sqrt(detS[part])[:, None] * (integrand @ w) * u_max[part] / 2)
+    return list(np.concatenate(model_eta).T)
@@ -1,8 +1,37 @@
-from pyatmosphere.gpu import get_xp
+import numpy as np
 
+from pyatmosphere.gpu import get_xp, get_fft
 
-def calculate_sf(input):
+
+def calculate_sf(input, lags=None, method="fft"):
+    """Structure function along the last axis for every row
+
+    Parameters:
+    input (array): Real phase screen
+    lags (sequence of int): Lags in pixels, 1..N-1 by default
+    method (str): "fft" computes all lags from the rows autocorrelation in O(N log N) per row,
+        "direct" costs O(N) per row and lag and suits a few lags
+
+    Returns:
+    sf (array): Lag-averaged squared differences of shape (len(lags), rows)"""
     xp = get_xp()
-    a = [xp.sum((input[:, :-r] - input[:, r:])**2, axis=1) /
-        (input.shape[1] - r) for r in range(1, input.shape[1])]
-    return xp.array(a)
+    N = input.shape[-1]
+    lags = np.arange(1, N) if lags is None else np.asarray(lags)
+    if method == "direct":
+        a = [xp.sum((input[..., :-r] - input[..., r:])**2, axis=-1) /
+             (N - r) for r in lags]
+        return xp.array(a)
+    elif method == "fft":
+        # The differences do not depend on the row mean, removing it reduces cancellation
+        a = input.astype(np.float64) - input.mean(axis=-1, keepdims=True)
+        a2_cumsum = xp.concatenate(
+            [xp.zeros((*a.shape[:-1], 1)), xp.cumsum(a**2, axis=-1)], axis=-1)
+        spectrum = get_fft().rfft(a, n=2 * N, axis=-1)
+        autocorrelation = get_fft().irfft(abs(spectrum)**2, n=2 * N, axis=-1)[..., :N]
+        # sum_{j < N - r} (a_j - a_{j + r})**2 = sum_{j < N - r} a_j**2 + sum_{j >= r} a_j**2 - 2 R(r)
+        r = xp.asarray(lags)
+        sf = (a2_cumsum[..., N - r] + a2_cumsum[..., -1:] - a2_cumsum[..., r] -
+              2 * autocorrelation[..., r]) / (N - r)
+        return xp.moveaxis(sf, -1, 0)
+    else:
+        raise ValueError("Available values for method: 'fft' and 'direct'")
@@ -1,7 +1,50 @@
-from pyatmosphere.gpu import get_xp
-from pyatmosphere.utils import fft2, ifft2
+from functools import lru_cache
+import numpy as np
 
+from pyatmosphere.gpu import get_xp, get_fft
+from pyatmosphere.grids import RectGrid
+from pyatmosphere.utils import fft2, ifft2, to_native_order
 
-def vacuum_propagation(input, length, k, delta, f2, f_delta):
+
+TRANSFER_FUNCTIONS_CACHE_SIZE = 8
+
+
+def get_transfer_function(length, k, f2):
     xp = get_xp()
-    return ifft2(xp.exp(1j * k * length) * xp.exp(-1j * xp.pi * length * (2 * xp.pi / k) * f2) * fft2(input, delta), f_delta)
+    return xp.exp(1j * k * length) * xp.exp(-1j * xp.pi * length * (2 * xp.pi / k) * f2)
+
+
+@lru_cache(maxsize=TRANSFER_FUNCTIONS_CACHE_SIZE)
+def _get_cached_transfer_function(length, k, resolution, delta, backend, native):
+    f_grid = RectGrid(resolution, delta).get_f_grid()
+    transfer_function = get_transfer_function(length, k, f_grid.get_rho2())
+    if native:
+        # Scale factors of the centered fft2 and ifft2 are folded into the kernel
+        scale = (delta * resolution[0] * f_grid.delta)**2
+        transfer_function = to_native_order(transfer_function * scale)
+    if isinstance(transfer_function, np.ndarray):
+        transfer_function.flags.writeable = False
+    return transfer_function
+
+
+def get_cached_transfer_function(length, k, resolution, delta, native=False):
+    """Return the read-only Fresnel transfer function from a bounded LRU cache
+
+    With `native` the kernel is in native FFT order for `native_vacuum_propagation`.
+    """
+    xp = get_xp()
+    # Steps of equal length may differ in the last bits after the positions arithmetic
+    length = float(f"{length:.12g}")
+    return _get_cached_transfer_function(length, float(k), tuple(resolution), float(delta), xp.__name__, native)
+
+
+def vacuum_propagation(input, length, k, delta, f2=None, f_delta=None, transfer_function=None):
+    if transfer_function is None:
+        transfer_function = get_transfer_function(length, k, f2)
+    return ifft2(transfer_function * fft2(input, delta), f_delta)
+
+
+def native_vacuum_propagation(input, transfer_function):
+    """Propagate a field in native FFT order with a native transfer function, no shifts involved"""
+    fft = get_fft()
+    return fft.ifft2(transfer_function * fft.fft2(input))
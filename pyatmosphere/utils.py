@@ -1,7 +1,7 @@
 from dataclasses import dataclass
 from typing import Sequence
 
-from pyatmosphere.gpu import get_xp
+from pyatmosphere.gpu import get_xp, get_fft
 
 
 class CrossRef:
@@ -40,11 +40,34 @@ class PolarDiscreteFunction():
 
 
 def fft2(x, delta):
+    """Centered 2D FFT over the last two axes, leading axes are batch axes"""
     xp = get_xp()
-    return xp.fft.fftshift(xp.fft.fft2(xp.fft.fftshift(x))) * delta**2
+    axes = (-2, -1)
+    return xp.fft.fftshift(get_fft().fft2(xp.fft.fftshift(x, axes=axes), axes=axes), axes=axes) * delta**2
 
 
 def ifft2(x, delta):
+    """Centered 2D inverse FFT over the last two axes, leading axes are batch axes"""
     xp = get_xp()
-    N = x.shape[0]
-    return xp.fft.ifftshift(xp.fft.ifft2(xp.fft.ifftshift(x))) * (N * delta)**2
+    axes = (-2, -1)
+    N = x.shape[-1]
+    return xp.fft.ifftshift(get_fft().ifft2(xp.fft.ifftshift(x, axes=axes), axes=axes), axes=axes) * (N * delta)**2
+
+
+def to_native_order(x):
+    """Move the origin of a centered field to index 0 as expected by the FFT
+
+    Scalar fields, such as the output of PlaneSource, have no order and are returned as is.
+    """
+    xp = get_xp()
+    if xp.ndim(x) < 2:
+        return x
+    return xp.fft.ifftshift(x, axes=(-2, -1))
+
+
+def to_centered_order(x):
+    """Move the origin of a field in native FFT order to the center of the grid"""
+    xp = get_xp()
+    if xp.ndim(x) < 2:
+        return x
+    return xp.fft.fftshift(x, axes=(-2, -1))